@@ -0,0 +1,97 @@
+"""
+Parse throughput of ChatMark responses, and import time of lib.chatmark.
+
+Parses checkbox and text editor responses with yaml.safe_load and with
+parse_response, then imports lib.chatmark in fresh interpreters under
+-X importtime. yaml is only imported when a response needs the fallback.
+
+Usage: python benchmarks/chatmark_parse.py [--rounds 200] [--imports 5]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import Dict
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import yaml  # noqa: E402
+
+from lib.chatmark.response_parser import parse_response  # noqa: E402
+
+
+def checkbox_response(keys: int) -> str:
+    lines = [f"file_{i}: checked" for i in range(keys)]
+    return "```yaml\n" + "\n".join(lines) + "\n```"
+
+
+def editor_response(lines: int) -> str:
+    body = "\n".join(f"    line {i}: some text of the commit message" for i in range(lines))
+    return "```yaml\neditor: |\n" + body + "\n```"
+
+
+def per_call(parse, response: str, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        parse(response)
+    return (time.perf_counter() - start) * 1000 / rounds
+
+
+def bench_parse(rounds: int):
+    for name, response in (
+        ("200 checkbox keys", checkbox_response(200)),
+        ("200-line editor block", editor_response(200)),
+    ):
+        # the response without its fences, as the YAML parser got it
+        body = response.split("\n", 1)[1].rsplit("\n", 1)[0]
+        assert parse_response(response) == yaml.safe_load(body)
+        slow = per_call(yaml.safe_load, body, rounds)
+        fast = per_call(parse_response, response, rounds)
+        print(f"  {name:<22} yaml {slow:6.2f} ms, parse_response {fast:5.2f} ms")
+
+
+# modules reported in the import time of lib.chatmark, 0 when not imported
+IMPORT_PARTS = ["lib.chatmark.iobase", "lib.ide_service", "yaml"]
+
+
+def import_times() -> Dict[str, float]:
+    """
+    Cumulative import times in ms of lib.chatmark and of IMPORT_PARTS.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import lib.chatmark"],
+        cwd=ROOT,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    times = dict.fromkeys(["lib.chatmark"] + IMPORT_PARTS, 0.0)
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() in times:
+            times[parts[2].strip()] = int(parts[1]) / 1000
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--imports", type=int, default=5)
+    args = parser.parse_args()
+
+    print("parse time per response")
+    bench_parse(args.rounds)
+
+    print("import time of lib.chatmark")
+    for _ in range(args.imports):
+        times = import_times()
+        parts = ", ".join(f"{name} {times[name]:.1f} ms" for name in IMPORT_PARTS)
+        print(f"  {times['lib.chatmark']:6.1f} ms, of which {parts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Stress test of ChatMark interactions over stdin/stdout.
+
+Runs a child workflow rendering --prompts Checkbox widgets, which also asks
+a StubIDEServer for the IDE language before each prompt like the workflows
+do. This script answers the widgets as the IDE would, except every
+--cancel-every-th one, which the child renders with render_async() and
+cancels. Then checks that a workflow whose stdin is closed gets an empty
+response instead of spinning.
+
+Usage: python benchmarks/chatmark_pipe.py [--prompts 3000] [--cancel-every 10]
+"""
+
+import argparse
+import os
+import re
+import resource
+import subprocess
+import sys
+import threading
+import time
+from typing import List
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from lib.ide_service.stub_server import StubIDEServer  # noqa: E402
+
+# id of an option of a Checkbox, in "> [](id) option"
+_OPTION_KEY = re.compile(r"^> \[x?\]\((\w+)\)")
+
+# seconds before the child cancels a prompt left unanswered
+CANCEL_AFTER = 0.01
+# seconds a prompt may wait at most, failing the run
+PROMPT_TIMEOUT = 10.0
+
+
+def run_child(prompts: int, cancel_every: int):
+    from lib.chatmark import Checkbox
+    from lib.ide_service import IDEService
+
+    answered = cancelled = wrong = 0
+    for i in range(prompts):
+        IDEService().ide_language()
+        cancel = cancel_every > 0 and i % cancel_every == cancel_every - 1
+        checkbox = Checkbox([f"option {i}", "other option"], title=f"prompt {i} {cancel}")
+        if cancel:
+            handle = checkbox.render_async(PROMPT_TIMEOUT)
+            threading.Timer(CANCEL_AFTER, handle.cancel).start()
+            handle.result()
+            cancelled += checkbox.selections == []
+            wrong += checkbox.selections != []
+        else:
+            checkbox.render()
+            answered += checkbox.selections == [0]
+            wrong += checkbox.selections != [0]
+    print(f"RESULT {answered} {cancelled} {wrong}", flush=True)
+
+
+def child_command(*args: str):
+    return [sys.executable, os.path.abspath(__file__), "--child", *args]
+
+
+def cpu_time() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def bench_prompts(prompts: int, cancel_every: int):
+    cpu = cpu_time()
+    start = time.perf_counter()
+    child = subprocess.Popen(
+        child_command("--prompts", str(prompts), "--cancel-every", str(cancel_every)),
+        cwd=ROOT,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    result = None
+    title: List[str] = []
+    keys: List[str] = []
+    for line in child.stdout:
+        if line.startswith("```chatmark"):
+            title, keys = [], []
+        elif line.startswith("prompt "):
+            title = line.split()
+        elif line.startswith("> "):
+            keys.append(_OPTION_KEY.search(line).group(1))
+        elif line.startswith("```") and title:
+            # answer the widget by checking its first option, unless it is to be cancelled
+            if title[2] == "False":
+                child.stdin.write(f"```yaml\n{keys[0]}: checked\n```\n")
+                child.stdin.flush()
+            title = []
+        elif line.startswith("RESULT"):
+            result = [int(word) for word in line.split()[1:]]
+    child.stdin.close()
+    child.wait()
+    wall = time.perf_counter() - start
+
+    if result is None:
+        print(f"  child failed with exit code {child.returncode}")
+        return
+    answered, cancelled, wrong = result
+    print(f"  {prompts} prompts: {wall:.2f} s wall, {cpu_time() - cpu:.2f} s CPU")
+    print(f"  {answered} answered, {cancelled} cancelled, {wrong} wrong responses")
+
+
+def bench_closed_stdin():
+    cpu = cpu_time()
+    start = time.perf_counter()
+    result = subprocess.run(
+        child_command("--prompts", "1", "--cancel-every", "0"),
+        cwd=ROOT,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        text=True,
+        timeout=PROMPT_TIMEOUT * 2,
+    )
+    wall = time.perf_counter() - start
+    # an empty response to an uncancelled prompt is counted as wrong
+    closed = "RESULT 0 0 1" in result.stdout
+    print(f"  stdin at /dev/null: {wall:.2f} s wall, {cpu_time() - cpu:.2f} s CPU", end="")
+    print(", empty response" if closed else ", unexpected output")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--prompts", type=int, default=3000)
+    parser.add_argument("--cancel-every", type=int, default=10)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.prompts, args.cancel_every)
+        return
+
+    with StubIDEServer({"ide_language": lambda: "en"}):
+        print("Checkbox round trips, with cancels")
+        bench_prompts(args.prompts, args.cancel_every)
+        print("closed input")
+        bench_closed_stdin()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Restaging the files picked in the commit workflows, one git process per file vs batched.
+
+Creates a repository with --files changed files, half of them staged, and
+names with spaces, glob characters and non-ASCII letters. Then stages all
+unstaged files and unstages every other staged file, like rebuild_stage_list
+does, with git add/reset per file and with git_pathspec_batch, and checks
+that both leave the same index.
+
+Usage: python benchmarks/commit_staging.py [--files 10000]
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from lib.commit_diff import git_pathspec_batch  # noqa: E402
+
+
+def git(*args: str, **kwargs):
+    return subprocess.run(["git", *args], check=True, stdout=subprocess.PIPE, **kwargs).stdout
+
+
+def create_repo(path: str, files: int):
+    os.makedirs(path)
+    os.chdir(path)
+    git("init", "-q")
+    git("config", "user.email", "bench@example.com")
+    git("config", "user.name", "bench")
+    names = [f"d{i % 50}/file {i}.txt" for i in range(files - 3)]
+    names += ["a[1].txt", "ünï.txt", "gone.txt"]
+    for name in names:
+        os.makedirs(os.path.dirname(name) or ".", exist_ok=True)
+        with open(name, "w", encoding="utf-8") as file:
+            file.write("x\n")
+    git("add", "-A")
+    git("commit", "-qm", "init")
+
+    for name in names:
+        with open(name, "a", encoding="utf-8") as file:
+            file.write("y\n")
+    os.remove("gone.txt")
+    git("add", "--", *names[: files // 2])
+    with open("new file.txt", "w", encoding="utf-8") as file:
+        file.write("n\n")
+
+
+def per_file(unstaged: List[str], to_unstage: List[str]):
+    for file in unstaged:
+        git("add", file)
+    for file in to_unstage:
+        git("reset", "-q", file)
+
+
+def batched(unstaged: List[str], to_unstage: List[str]):
+    git_pathspec_batch(["add"], unstaged)
+    git_pathspec_batch(["reset", "-q"], to_unstage)
+
+
+def restage(base: str, path: str, restage_files) -> bytes:
+    shutil.copytree(base, path, symlinks=True)
+    os.chdir(path)
+    staged = git("diff", "--name-only", "--cached", "-z").decode("utf-8").split("\0")
+    status = git("status", "--porcelain", "-uall", "-z").decode("utf-8").split("\0")
+    unstaged = [line[3:] for line in status if line and line[1] != " "]
+    to_unstage = [file for file in staged if file][1::2]
+
+    start = time.perf_counter()
+    restage_files(unstaged, to_unstage)
+    elapsed = time.perf_counter() - start
+    print(f"  {restage_files.__name__:<9} {elapsed:7.2f} s")
+    return git("diff", "--cached", "--name-status")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--files", type=int, default=10000)
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    root = tempfile.mkdtemp(prefix="commit_staging_")
+    try:
+        base = os.path.join(root, "base")
+        create_repo(base, args.files)
+        print(f"restaging {args.files} changed files")
+        slow = restage(base, os.path.join(root, "per_file"), per_file)
+        fast = restage(base, os.path.join(root, "batched"), batched)
+        print(f"  same index: {slow == fast}")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
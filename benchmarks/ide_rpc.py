@@ -0,0 +1,57 @@
+"""
+Latency of IDE service calls, a new connection per call vs the pooled transport.
+
+Calls ide_language on a StubIDEServer, once with requests.post like the
+workflows did before the shared transport, then through IDEService.
+
+Usage: python benchmarks/ide_rpc.py [--calls 2000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import requests  # noqa: E402
+
+from lib.ide_service import IDEService, get_transport  # noqa: E402
+from lib.ide_service.stub_server import StubIDEServer  # noqa: E402
+
+
+def bench_bare_post(url: str, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        requests.post(f"{url}/ide_language", json={}).json()
+    return time.perf_counter() - start
+
+
+def bench_transport(calls: int) -> float:
+    service = IDEService()
+    start = time.perf_counter()
+    for _ in range(calls):
+        service.ide_language()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    # every call must reach the stub, ide_language is cached for the process otherwise
+    os.environ["DEVCHAT_IDE_SERVICE_NO_CACHE"] = "1"
+    with StubIDEServer({"ide_language": lambda: "en"}) as stub:
+        bare = bench_bare_post(stub.url, args.calls)
+        pooled = bench_transport(args.calls)
+        stats = get_transport().stats()["ide_language"]
+
+    print(f"{args.calls} ide_language calls")
+    print(f"  requests.post:    {bare * 1000 / args.calls:.3f} ms/call")
+    print(f"  pooled transport: {pooled * 1000 / args.calls:.3f} ms/call")
+    print(f"  transport stats:  {stats.count} calls, {stats.errors} errors")
+
+
+if __name__ == "__main__":
+    main()
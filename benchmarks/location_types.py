@@ -0,0 +1,79 @@
+"""
+Construction and hashing of IDE locations.
+
+Builds locations from IDE json with pydantic validation (parse_obj), with
+from_raw, and with from_raw interning equal locations, then puts them in a
+set. Last, fetches them through find_def_locations on a StubIDEServer.
+
+Usage: python benchmarks/location_types.py [--locations 100000] [--files 200]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from lib.ide_service import IDEService, Location  # noqa: E402
+from lib.ide_service.stub_server import StubIDEServer  # noqa: E402
+
+
+def raw_locations(count: int, files: int):
+    rand = random.Random(0)
+    locations = []
+    for _ in range(count):
+        line = rand.randrange(200)
+        character = rand.randrange(2)
+        locations.append(
+            {
+                "abspath": f"/workspace/src/package/module_{rand.randrange(files)}.py",
+                "range": {
+                    "start": {"line": line, "character": character},
+                    "end": {"line": line, "character": character + 8},
+                },
+            }
+        )
+    return locations
+
+
+def bench(name: str, build, raw):
+    start = time.perf_counter()
+    locations = build(raw)
+    built = time.perf_counter() - start
+    start = time.perf_counter()
+    unique = set(locations)
+    hashed = time.perf_counter() - start
+    print(f"  {name:<20} build {built * 1000:7.0f} ms, set() {hashed * 1000:6.0f} ms", end="")
+    print(f", {len(unique)} unique")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--locations", type=int, default=100000)
+    parser.add_argument("--files", type=int, default=200)
+    args = parser.parse_args()
+
+    raw = raw_locations(args.locations, args.files)
+    print(f"{args.locations} locations over {args.files} files")
+    bench("parse_obj", lambda items: [Location.parse_obj(item) for item in items], raw)
+    bench("from_raw", lambda items: [Location.from_raw(item) for item in items], raw)
+
+    def interned(items):
+        table = {}
+        return [Location.from_raw(item, table) for item in items]
+
+    bench("from_raw interned", interned, raw)
+
+    # every call must reach the stub, locations are cached on disk otherwise
+    os.environ["DEVCHAT_IDE_SERVICE_NO_CACHE"] = "1"
+    with StubIDEServer({"find_def_locations": lambda abspath, line, character: raw}):
+        start = time.perf_counter()
+        locations = IDEService().find_def_locations("/workspace/src/main.py", 0, 0)
+        fetched = time.perf_counter() - start
+    print(f"  find_def_locations   {fetched * 1000:7.0f} ms for {len(locations)} locations")
+
+
+if __name__ == "__main__":
+    main()
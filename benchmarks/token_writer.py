@@ -0,0 +1,115 @@
+"""
+Write syscalls of a streamed LLM answer, printed token by token vs through coalesced_stdout.
+
+Runs a child workflow printing --tokens tokens, one every --interval seconds,
+with print(token, flush=True, end="") like the stream_out workflows, then
+again inside coalesced_stdout(). The child counts its write syscalls from
+/proc/self/io (Linux), this script reads its stdout and measures the time
+to the first token.
+
+Usage: python benchmarks/token_writer.py [--tokens 10000] [--interval 0.0005]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import Optional
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+# a ChatMark fence in the stream, written whole by the coalescing writer
+FENCE_EVERY = 1000
+
+
+def write_syscalls() -> Optional[int]:
+    try:
+        with open("/proc/self/io", "r", encoding="utf-8") as file:
+            for line in file:
+                if line.startswith("syscw:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def stream_tokens(tokens: int, interval: float):
+    for i in range(tokens):
+        if i and i % FENCE_EVERY == 0:
+            print("\n```chatmark\n> [](id) option\n```\n", flush=True, end="")
+        print(f" tok{i % 10}", flush=True, end="")
+        time.sleep(interval)
+
+
+def run_child(tokens: int, interval: float, coalesced: bool):
+    from lib.chatmark import coalesced_stdout
+
+    start = time.time()
+    before = write_syscalls()
+    if coalesced:
+        with coalesced_stdout():
+            stream_tokens(tokens, interval)
+    else:
+        stream_tokens(tokens, interval)
+    elapsed = time.time() - start
+    after = write_syscalls()
+    syscalls = after - before if before is not None and after is not None else -1
+    print(f"RESULT {start} {elapsed} {syscalls}", file=sys.stderr, flush=True)
+
+
+def bench(tokens: int, interval: float, coalesced: bool):
+    args = [sys.executable, os.path.abspath(__file__), "--child"]
+    args += ["--tokens", str(tokens), "--interval", str(interval)]
+    if coalesced:
+        args.append("--coalesced")
+    child = subprocess.Popen(args, cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    first_token_at = None
+    output = b""
+    while True:
+        chunk = os.read(child.stdout.fileno(), 65536)
+        if not chunk:
+            break
+        if first_token_at is None:
+            first_token_at = time.time()
+        output += chunk
+    stderr = child.communicate()[1].decode("utf-8")
+
+    result = [line for line in stderr.splitlines() if line.startswith("RESULT")]
+    if not result:
+        print(f"  child failed: {stderr.strip()}")
+        return
+    start, elapsed, syscalls = result[-1].split()[1:]
+    elapsed, syscalls = float(elapsed), int(syscalls)
+    fences_whole = output.count(b"\n```chatmark\n> [](id) option\n```\n")
+
+    name = "coalesced_stdout" if coalesced else "print per token"
+    rate = f"{syscalls / elapsed:7.0f} syscalls/s" if syscalls >= 0 else "syscalls n/a"
+    print(
+        f"  {name:<16} {syscalls:6d} write syscalls, {rate}, {elapsed:.2f} s, "
+        f"first token after {(first_token_at - float(start)) * 1000:.1f} ms, "
+        f"{fences_whole} fences whole"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--tokens", type=int, default=10000)
+    parser.add_argument("--interval", type=float, default=0.0005)
+    parser.add_argument("--coalesced", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.tokens, args.interval, args.coalesced)
+        return
+
+    print(f"{args.tokens} tokens, one every {args.interval * 1000:.1f} ms")
+    bench(args.tokens, args.interval, coalesced=False)
+    bench(args.tokens, args.interval, coalesced=True)
+
+
+if __name__ == "__main__":
+    main()
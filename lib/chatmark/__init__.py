@@ -1,12 +1,21 @@
+from lib.ide_service.tracing import span
+
 from .form import Form
+from .handle import RenderHandle
 from .step import Step
-from .widgets import Button, Checkbox, Radio, TextEditor
+from .token_writer import TokenWriter, coalesced_stdout
+from .widgets import Button, Checkbox, GroupedCheckbox, Radio, TextEditor
 
 __all__ = [
     "Checkbox",
+    "GroupedCheckbox",
     "TextEditor",
     "Radio",
     "Button",
     "Form",
     "Step",
+    "span",
+    "RenderHandle",
+    "TokenWriter",
+    "coalesced_stdout",
 ]
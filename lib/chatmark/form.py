@@ -1,5 +1,6 @@
 from typing import Dict, List, Optional, Union
 
+from .handle import RenderHandle
 from .iobase import pipe_interaction
 from .widgets import Button, Widget
 
@@ -68,9 +69,9 @@ class Form:
             if isinstance(c, Widget):
                 c._parse_response(response)
 
-    def render(self):
+    def _start_render(self) -> str:
         """
-        Render to receive user input
+        Mark as rendered and return the ChatMark message
         """
         if self._rendered:
             # already rendered once
@@ -90,6 +91,20 @@ class Form:
             "```",
         ]
 
-        chatmark = "\n".join(lines)
+        return "\n".join(lines)
+
+    def render(self):
+        """
+        Render to receive user input
+        """
+        chatmark = self._start_render()
         response = pipe_interaction(chatmark)
         self._parse_response(response)
+
+    def render_async(self, timeout: Optional[float] = None) -> RenderHandle:
+        """
+        Render without blocking to receive user input
+        return a handle to wait for the answer while running other work
+        """
+        chatmark = self._start_render()
+        return RenderHandle(self, chatmark, self._parse_response, timeout)
@@ -0,0 +1,134 @@
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+from .iobase import _start_interaction, _wait_response, cancel_interaction
+
+# work submitted to render handles running at once
+MAX_BACKGROUND_WORKERS = 4
+
+_job_slots = threading.BoundedSemaphore(MAX_BACKGROUND_WORKERS)
+
+
+def _run_job(job: Future, fn: Callable, args, kwargs):
+    with _job_slots:
+        if not job.set_running_or_notify_cancel():
+            return
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as err:
+            job.set_exception(err)
+        else:
+            job.set_result(result)
+
+
+class RenderHandle:
+    """
+    The pending answer of a widget or form rendered with render_async().
+
+    The message is sent when the handle is created, the answer is read in a
+    background thread. Meanwhile the workflow can run work with submit(), and
+    get the rendered widget or form with result(), or by awaiting the handle.
+
+    The handle is cancelled when the user cancels (an empty response) or on
+    cancel(). Work submitted and not started yet is then cancelled, running
+    work can stop early by checking the cancelled event.
+
+    Usage:
+    handle = form.render_async()
+    draft = handle.submit(generate_message, diff, handle.cancelled)
+    form = handle.result()
+    if not handle.cancelled.is_set():
+        message = draft.result()
+    """
+
+    def __init__(
+        self,
+        owner: Any,
+        chatmark: str,
+        parse: Callable[[Dict], None],
+        timeout: Optional[float] = None,
+    ):
+        """
+        owner: the widget or form, returned as the result
+        parse: parses the response into the owner
+        """
+        self._owner = owner
+        self._parse = parse
+        self._future: "Future[Any]" = Future()
+        self._jobs: List[Future] = []
+        self._lock = threading.Lock()
+        # set when the interaction is cancelled, for the background work to poll
+        self.cancelled = threading.Event()
+
+        _start_interaction(chatmark)
+        thread = threading.Thread(target=self._wait, args=(timeout,), daemon=True)
+        thread.start()
+
+    def _wait(self, timeout: Optional[float]):
+        try:
+            response = _wait_response(timeout)
+            self._parse(response)
+        except BaseException as err:
+            self._cancel_jobs()
+            self._future.set_exception(err)
+            return
+
+        if not response:
+            self._cancel_jobs()
+        self._future.set_result(self._owner)
+
+    def _cancel_jobs(self):
+        with self._lock:
+            self.cancelled.set()
+            jobs, self._jobs = self._jobs, []
+        for job in jobs:
+            job.cancel()
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """
+        Run fn(*args, **kwargs) in the background, cancelled with the interaction.
+        """
+        job: Future = Future()
+        with self._lock:
+            if self.cancelled.is_set():
+                job.cancel()
+                return job
+            self._jobs.append(job)
+
+        # daemon threads, work still running does not delay the exit of the workflow
+        # in a copy of the context, e.g. to be traced under the current span
+        context = contextvars.copy_context()
+        thread = threading.Thread(
+            target=context.run, args=(_run_job, job, fn, args, kwargs), daemon=True
+        )
+        thread.start()
+        return job
+
+    def cancel(self):
+        """
+        Stop waiting for the answer, as if the user cancelled.
+        """
+        if not self._future.done():
+            cancel_interaction()
+        self._cancel_jobs()
+
+    def done(self) -> bool:
+        return self._future.done()
+
+    def result(self, timeout: Optional[float] = None) -> Any:
+        """
+        Wait for the answer and return the widget or form.
+
+        Raises concurrent.futures.TimeoutError if the answer is not there within
+        timeout seconds, TimeoutError if the render timeout expired.
+        """
+        return self._future.result(timeout)
+
+    def add_done_callback(self, fn: Callable[["RenderHandle"], None]):
+        self._future.add_done_callback(lambda _: fn(self))
+
+    def __await__(self):
+        return asyncio.wrap_future(self._future).__await__()
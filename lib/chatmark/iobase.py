@@ -1,4 +1,12 @@
-import yaml
+import os
+import queue
+import selectors
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+from .response_parser import ResponseParser, parse_response
 
 
 def _send_message(message):
@@ -6,38 +14,193 @@ def _send_message(message):
     print(out_data, flush=True)
 
 
-def _parse_chatmark_response(response):
-    # resonse looks like:
+class _Cancelled(Exception):
+    pass
+
+
+class _SelectorLineReader:
     """
-    ``` some_name
-    some key name 1: value1
-    some key name 2: value2
-    ```
+    Reads lines from a file descriptor, blocking in a selector until data,
+    the timeout or a cancel arrives.
     """
-    # parse key values
-    lines = response.strip().split("\n")
-    if len(lines) <= 2:
-        return {}
 
-    data = yaml.safe_load("\n".join(lines[1:-1]))
-    return data
+    def __init__(self, fd: int):
+        self._fd = fd
+        self._buffer = b""
+        self._eof = False
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        os.set_blocking(self._wakeup_r, False)
+        os.set_blocking(self._wakeup_w, False)
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(fd, selectors.EVENT_READ)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ)
 
+    def _drain_wakeups(self):
+        try:
+            while os.read(self._wakeup_r, 512):
+                pass
+        except BlockingIOError:
+            pass
 
-def pipe_interaction(message: str):
-    _send_message(message)
+    def reset_cancel(self):
+        """
+        Forget cancels made while no interaction was waiting.
+        """
+        self._drain_wakeups()
+
+    def readline(self, timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Return the next line without its line break, None at end of input.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while b"\n" not in self._buffer:
+            if self._eof:
+                if not self._buffer:
+                    return None
+                line, self._buffer = self._buffer, b""
+                return line.decode("utf-8", errors="replace").rstrip("\r")
 
-    lines = []
-    while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            events = self._selector.select(remaining)
+            if not events:
+                raise TimeoutError("No response in time")
+            for key, _ in events:
+                if key.fd == self._wakeup_r:
+                    self._drain_wakeups()
+                    raise _Cancelled()
+                chunk = os.read(self._fd, 65536)
+                if chunk:
+                    self._buffer += chunk
+                else:
+                    self._eof = True
+
+        line, _, self._buffer = self._buffer.partition(b"\n")
+        return line.decode("utf-8", errors="replace").rstrip("\r")
+
+    def cancel(self):
         try:
-            line = input()
-            if line.strip().startswith("```yaml"):
-                lines = []
-            elif line.strip() == "```":
-                lines.append(line)
-                break
-            lines.append(line)
-        except EOFError:
+            os.write(self._wakeup_w, b"\0")
+        except BlockingIOError:
+            # a wakeup is already pending
             pass
 
-    response = "\n".join(lines)
-    return _parse_chatmark_response(response)
+
+_CANCEL = object()
+
+
+class _ThreadLineReader:
+    """
+    Reads lines in a background thread, for inputs that can't be polled
+    (Windows pipes, regular files, replaced sys.stdin).
+    """
+
+    def __init__(self, stream):
+        self._lines: "queue.Queue" = queue.Queue()
+        self._cancelled = threading.Event()
+        thread = threading.Thread(target=self._read, args=(stream,), daemon=True)
+        thread.start()
+
+    def _read(self, stream):
+        for line in iter(stream.readline, ""):
+            self._lines.put(line.rstrip("\r\n"))
+        self._lines.put(None)
+
+    def reset_cancel(self):
+        """
+        Forget cancels made while no interaction was waiting.
+        """
+        # their queued wakeups are skipped while the flag is clear
+        self._cancelled.clear()
+
+    def readline(self, timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Return the next line without its line break, None at end of input.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                line = self._lines.get(timeout=remaining)
+            except queue.Empty:
+                raise TimeoutError("No response in time") from None
+            if line is not _CANCEL:
+                break
+            if self._cancelled.is_set():
+                raise _Cancelled()
+
+        if line is None:
+            # keep reporting the end of input
+            self._lines.put(None)
+        return line
+
+    def cancel(self):
+        self._cancelled.set()
+        self._lines.put(_CANCEL)
+
+
+_reader = None
+_reader_lock = threading.Lock()
+
+
+def _get_reader():
+    global _reader
+    with _reader_lock:
+        if _reader is None:
+            if os.name != "nt":
+                try:
+                    _reader = _SelectorLineReader(sys.stdin.fileno())
+                except (AttributeError, OSError, ValueError):
+                    # no file descriptor, or one that can't be polled like a regular file
+                    pass
+            if _reader is None:
+                _reader = _ThreadLineReader(sys.stdin)
+        return _reader
+
+
+def _parse_chatmark_response(response):
+    return parse_response(response)
+
+
+def _start_interaction(message: str):
+    """
+    Send a ChatMark message, its response is read by _wait_response().
+    """
+    _get_reader().reset_cancel()
+    _send_message(message)
+
+
+def _wait_response(timeout: Optional[float] = None) -> Dict:
+    reader = _get_reader()
+    parser = ResponseParser()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    try:
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            line = reader.readline(remaining)
+            if line is None:
+                return {}
+            if parser.feed(line):
+                return parser.result()
+    except _Cancelled:
+        return {}
+
+
+def pipe_interaction(message: str, timeout: Optional[float] = None) -> Dict:
+    """
+    Send a ChatMark message and wait for the user's response.
+
+    Returns an empty response if the input is closed or the wait is cancelled
+    by cancel_interaction(). Raises TimeoutError if no response is complete
+    within timeout seconds.
+    """
+    _start_interaction(message)
+    return _wait_response(timeout)
+
+
+def cancel_interaction():
+    """
+    Wake up a pipe_interaction waiting for a response, it returns an empty response.
+    """
+    _get_reader().cancel()
@@ -0,0 +1,175 @@
+import re
+from typing import Any, Dict, List, Optional
+
+# keys of widget ids, and plain values such as checked or clicked
+_KEY_VALUE = re.compile(r"([A-Za-z0-9_]+): +([A-Za-z][A-Za-z0-9_]*) *")
+# a literal block scalar, with its chomping indicator
+_BLOCK_HEADER = re.compile(r"([A-Za-z0-9_]+): +\|([+-]?) *")
+# keys resolved to numbers by YAML
+_NUMERIC_KEY = re.compile(r"[0-9_]+")
+# plain values resolved to booleans or null by YAML
+_RESERVED_VALUES = {"yes", "no", "true", "false", "on", "off", "null"}
+
+
+class ResponseParser:
+    """
+    Parses a ChatMark response fed line by line, which looks like:
+    ```yaml
+    file1: checked
+    editor1: |
+        some text
+    ```
+
+    Flat maps of plain values and literal block scalars are parsed as the lines
+    arrive. Any other YAML makes the parser fall back to PyYAML on the whole
+    response, imported only then.
+    """
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self._lines: List[str] = []
+        self._data: Dict[str, Any] = {}
+        self._fallback = False
+        self._complete = False
+
+        # the literal block scalar being read
+        self._block_key: Optional[str] = None
+        self._block_chomping = ""
+        self._block_indent: Optional[int] = None
+        self._block_lines: List[str] = []
+
+    def feed(self, line: str) -> bool:
+        """
+        Take the next line, return whether the response is complete.
+        """
+        stripped = line.strip()
+        if stripped.startswith("```yaml"):
+            self._reset()
+            self._lines.append(line)
+            return False
+        if not self._lines and not stripped:
+            # blank lines before the response
+            return False
+
+        self._lines.append(line)
+        if stripped == "```":
+            self._end_block(at_end=True)
+            self._complete = True
+            return True
+        if len(self._lines) > 1 and not self._fallback:
+            self._parse_line(line)
+        return False
+
+    def _parse_line(self, line: str):
+        if self._block_key is not None:
+            if self._block_line(line):
+                return
+            self._end_block()
+
+        if not line.strip():
+            return
+
+        match = _KEY_VALUE.fullmatch(line)
+        if match and self._plain_key(match.group(1)):
+            if match.group(2).lower() in _RESERVED_VALUES:
+                self._fallback = True
+            else:
+                self._data[match.group(1)] = match.group(2)
+            return
+
+        match = _BLOCK_HEADER.fullmatch(line)
+        if match and self._plain_key(match.group(1)):
+            self._block_key = match.group(1)
+            self._block_chomping = match.group(2)
+            self._block_indent = None
+            self._block_lines = []
+            return
+
+        self._fallback = True
+
+    def _plain_key(self, key: str) -> bool:
+        if _NUMERIC_KEY.fullmatch(key):
+            self._fallback = True
+            return False
+        return True
+
+    def _block_line(self, line: str) -> bool:
+        """
+        Take a line of the block scalar being read, return False if the block ended before it.
+        """
+        content = line.lstrip(" ")
+        indent = len(line) - len(content)
+        if not content:
+            if self._block_indent is None and indent:
+                # leading indented blank lines have their own rules
+                self._fallback = True
+            elif self._block_indent is not None and indent > self._block_indent:
+                self._block_lines.append(line[self._block_indent :])
+            else:
+                self._block_lines.append("")
+            return True
+
+        if content.startswith("\t") and (self._block_indent is None or indent < self._block_indent):
+            self._fallback = True
+            return True
+
+        if self._block_indent is None:
+            if indent == 0:
+                return False
+            self._block_indent = indent
+        if indent >= self._block_indent:
+            self._block_lines.append(line[self._block_indent :])
+            return True
+        if indent > 0:
+            # less indented than the block without ending the map
+            self._fallback = True
+            return True
+        return False
+
+    def _end_block(self, at_end: bool = False):
+        """
+        Store the block scalar being read, at_end if the response ends with its last line,
+        which then has no line break.
+        """
+        if self._block_key is None:
+            return
+
+        lines = self._block_lines
+        if self._block_chomping == "+":
+            text = "\n".join(lines)
+            if lines and not at_end:
+                text += "\n"
+        else:
+            kept = len(lines)
+            while lines and not lines[-1]:
+                lines.pop()
+            text = "\n".join(lines)
+            if lines and self._block_chomping == "" and (len(lines) < kept or not at_end):
+                text += "\n"
+        self._data[self._block_key] = text
+        self._block_key = None
+
+    def result(self) -> Dict:
+        # parse key values, between the fences
+        if len(self._lines) <= 2:
+            return {}
+
+        if self._fallback or not self._complete:
+            import yaml
+
+            return yaml.safe_load("\n".join(self._lines[1:-1]))
+
+        return self._data
+
+
+def parse_response(response: str) -> Dict:
+    """
+    Parse a whole ChatMark response.
+    """
+    parser = ResponseParser()
+    for line in response.strip().split("\n"):
+        if parser.feed(line):
+            break
+    return parser.result()
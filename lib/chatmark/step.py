@@ -2,6 +2,7 @@ import time
 from contextlib import AbstractContextManager
 
 from lib.ide_service import IDEService
+from lib.ide_service.tracing import current_span, profile_summary_enabled, span, summarize_span
 
 
 class Step(AbstractContextManager):
@@ -18,6 +19,11 @@ class Step(AbstractContextManager):
     Usage:
     with Step("Something is running..."):
         print("some details...")
+
+    The step is timed as a span: nested steps, spans and the RPCs made in the
+    block are recorded as its children, see lib/ide_service/tracing.py.
+    With DEVCHAT_WORKFLOW_PROFILE_SUMMARY=1, an outermost step prints
+    the summary of its span tree before closing.
     """
 
     def __init__(self, title: str):
@@ -26,8 +32,15 @@ class Step(AbstractContextManager):
 
     def __enter__(self):
         print(f"\n```Step\n# {self.title}", flush=True)
+        self._is_root = current_span() is None
+        self._span_context = span(self.title, "step")
+        self._span = self._span_context.__enter__()
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        self._span_context.__exit__(exc_type, exc_val, exc_tb)
+        if self._span is not None and self._is_root and profile_summary_enabled():
+            print(f"\n{summarize_span(self._span)}", flush=True)
+
         # close the step
         end_time = time.time()
         IDEService().ide_logging(
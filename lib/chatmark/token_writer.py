@@ -0,0 +1,134 @@
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, TextIO
+
+# seconds to collect tokens before writing them, about one frame of the chat UI
+DEFAULT_WINDOW = 0.016
+# characters written at once without waiting for the window
+DEFAULT_MAX_BUFFER = 4096
+
+
+def _held_back(buffer: str) -> int:
+    """
+    Return where the end of the buffer that must not be written yet starts.
+
+    A line being streamed that starts like a fence ("`", "``" or "```...") is
+    held back until it ends, so fence lines are always written whole.
+    """
+    start = buffer.rfind("\n") + 1
+    line = buffer[start:].lstrip()
+    if line.startswith("```") or (line and line.strip("`") == ""):
+        return start
+    return len(buffer)
+
+
+class TokenWriter:
+    """
+    Text stream coalescing small writes, such as streamed LLM tokens.
+
+    The first write after a quiet window is written at once, so the first token
+    shows without delay. The next writes are collected and written together
+    when the window has passed or max_buffer characters are waiting.
+    flush() only asks for the pending text to be written within the window,
+    close() writes everything.
+    """
+
+    def __init__(
+        self,
+        stream: Optional[TextIO] = None,
+        window: float = DEFAULT_WINDOW,
+        max_buffer: int = DEFAULT_MAX_BUFFER,
+    ):
+        self._stream = stream if stream is not None else sys.stdout
+        self.window = window
+        self.max_buffer = max_buffer
+
+        self._buffer: List[str] = []
+        self._size = 0
+        self._last_write = 0.0
+        self._deadline: Optional[float] = None  # when the pending text is written
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def write(self, text: str) -> int:
+        if not text:
+            return 0
+
+        with self._cond:
+            self._buffer.append(text)
+            self._size += len(text)
+            now = time.monotonic()
+            if now - self._last_write >= self.window or self._size >= self.max_buffer:
+                self._write_pending(now)
+            if self._size:
+                self._schedule(self._last_write + self.window)
+        return len(text)
+
+    def flush(self):
+        with self._cond:
+            if self._size:
+                self._schedule(self._last_write + self.window)
+
+    def close(self):
+        """
+        Write all pending text, including held back fence lines.
+        """
+        with self._cond:
+            self._closed = True
+            self._write_pending(time.monotonic(), everything=True)
+            self._cond.notify_all()
+
+    def __getattr__(self, name):
+        # encoding, fileno, isatty... of the underlying stream
+        return getattr(self._stream, name)
+
+    def _schedule(self, deadline: float):
+        if self._deadline is None or deadline < self._deadline:
+            self._deadline = deadline
+            self._cond.notify_all()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="token-writer", daemon=True)
+            self._thread.start()
+
+    def _write_pending(self, now: float, everything: bool = False):
+        buffer = "".join(self._buffer)
+        end = len(buffer) if everything else _held_back(buffer)
+        if end > 0:
+            self._stream.write(buffer[:end])
+            self._stream.flush()
+            self._last_write = now
+        self._buffer = [buffer[end:]] if end < len(buffer) else []
+        self._size = len(buffer) - end
+        self._deadline = None
+
+    def _run(self):
+        with self._cond:
+            while not self._closed:
+                if self._deadline is None:
+                    self._cond.wait()
+                    continue
+                remaining = self._deadline - time.monotonic()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+                self._write_pending(time.monotonic())
+
+
+@contextmanager
+def coalesced_stdout(
+    window: float = DEFAULT_WINDOW, max_buffer: int = DEFAULT_MAX_BUFFER
+) -> Iterator[TokenWriter]:
+    """
+    Coalesce what is printed to stdout in the block, e.g. by stream_out workflows.
+    """
+    stdout = sys.stdout
+    writer = TokenWriter(stdout, window, max_buffer)
+    sys.stdout = writer
+    try:
+        yield writer
+    finally:
+        sys.stdout = stdout
+        writer.close()
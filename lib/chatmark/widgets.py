@@ -1,7 +1,11 @@
+import heapq
+import re
 from abc import ABC, abstractmethod
+from fnmatch import translate
 from typing import Dict, List, Optional, Tuple
 from uuid import uuid4
 
+from .handle import RenderHandle
 from .iobase import pipe_interaction
 
 
@@ -31,9 +35,9 @@ class Widget(ABC):
         """
         pass
 
-    def render(self) -> None:
+    def _start_render(self) -> str:
         """
-        Render the widget to receive user input
+        Mark as rendered and return the ChatMark message
         """
         if self._rendered:
             # already rendered once
@@ -53,10 +57,24 @@ class Widget(ABC):
             "```",
         ]
 
-        chatmark = "\n".join(lines)
+        return "\n".join(lines)
+
+    def render(self) -> None:
+        """
+        Render the widget to receive user input
+        """
+        chatmark = self._start_render()
         response = pipe_interaction(chatmark)
         self._parse_response(response)
 
+    def render_async(self, timeout: Optional[float] = None) -> RenderHandle:
+        """
+        Render without blocking the widget to receive user input
+        return a handle to wait for the answer while running other work
+        """
+        chatmark = self._start_render()
+        return RenderHandle(self, chatmark, self._parse_response, timeout)
+
     @staticmethod
     def gen_id_prefix() -> str:
         return uuid4().hex
@@ -115,6 +133,10 @@ class Checkbox(Widget):
         self._states = check_states
         self._title = title
 
+        # ids of the options, and the option index of each id
+        self._keys = [self.gen_id(self._id_prefix, idx) for idx in range(len(options))]
+        self._key_index = {key: idx for idx, key in enumerate(self._keys)}
+
         self._selections: Optional[List[int]] = None
 
     @property
@@ -141,9 +163,8 @@ class Checkbox(Widget):
         if self._title:
             lines.append(self._title)
 
-        for idx, (option, state) in enumerate(zip(self._options, self._states)):
+        for key, option, state in zip(self._keys, self._options, self._states):
             mark = "[x]" if state else "[]"
-            key = self.gen_id(self._id_prefix, idx)
             lines.append(f"> {mark}({key}) {option}")
 
         text = "\n".join(lines)
@@ -152,17 +173,243 @@ class Checkbox(Widget):
     def _parse_response(self, response: Dict):
         selections = []
         for key, value in response.items():
-            prefix, index = self.parse_id(key)
-            # check if the prefix is the same as the widget's
-            if prefix != self._id_prefix:
-                continue
-
-            if value == "checked":
+            # keys of other widgets are not in the index
+            index = self._key_index.get(key)
+            if index is not None and value == "checked":
                 selections.append(index)
 
         self._selections = selections
 
 
+class _DirNode:
+    """
+    A directory in the tree of option paths
+    """
+
+    __slots__ = ("path", "dirs", "files", "expanded", "group")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.dirs: Dict[str, "_DirNode"] = {}
+        self.files: List[int] = []  # indices of the options directly in the directory
+        self.expanded = False
+        # the outermost collapsed directory containing this one, itself included
+        self.group: Optional["_DirNode"] = None
+
+    @property
+    def entries(self) -> int:
+        return len(self.dirs) + len(self.files)
+
+
+class GroupedCheckbox(Widget):
+    """
+    Checkbox for long lists of file paths, rendered in a bounded number of rows.
+
+    Options matching a filter pattern are gathered in one row per pattern.
+    The other options are shown one per row as long as they fit in max_rows,
+    directories that don't fit are collapsed into one row, which toggles all
+    the options under it. A row with only some of its options checked is
+    split in two rows, one of its checked options shown checked and one of
+    the others, so that each part can be toggled on its own.
+
+    ChatMark syntax:
+    ```chatmark
+    Which files would you like to commit?
+    > [x](file0) devchat/engine/prompter.py
+    > [](file1) vendor/ (2146 files)
+    > [](file2) *.lock (3 files)
+    ```
+
+    Response:
+    ```yaml
+    file0: checked
+    file1: checked
+    ```
+    """
+
+    def __init__(
+        self,
+        options: List[str],
+        check_states: Optional[List[bool]] = None,
+        title: Optional[str] = None,
+        paths: Optional[List[str]] = None,
+        filters: Optional[List[str]] = None,
+        max_rows: int = 200,
+        submit_button_name: str = "Submit",
+        cancel_button_name: str = "Cancel",
+    ):
+        """
+        options: options to be selected
+        check_states: initial check states of options, default to all False
+        title: title of the widget
+        paths: file paths of options to group them by, default to the options
+        filters: glob patterns of options to gather in one row each,
+            matched against the whole path, or the file name for patterns without "/"
+        max_rows: number of rows to fit the options in, by collapsing directories
+        """
+        super().__init__(submit_button_name, cancel_button_name)
+
+        if check_states is not None:
+            assert len(options) == len(check_states)
+        else:
+            check_states = [False for _ in options]
+        if paths is not None:
+            assert len(options) == len(paths)
+        else:
+            paths = options
+
+        self._options = options
+        self._states = check_states
+        self._title = title
+
+        # each row is a label and the indices of its options
+        self._rows = self._build_rows(
+            [p.replace("\\", "/").strip("/") for p in paths], filters or [], max_rows
+        )
+        # number of options of the row a part was split from, by row index
+        self._split: Dict[int, int] = {}
+        self._split_partly_checked()
+        self._keys = [self.gen_id(self._id_prefix, idx) for idx in range(len(self._rows))]
+        self._key_index = {key: idx for idx, key in enumerate(self._keys)}
+
+        self._selections: Optional[List[int]] = None
+
+    def _build_rows(
+        self, paths: List[str], filters: List[str], max_rows: int
+    ) -> List[Tuple[str, List[int]]]:
+        matchers = [(f, re.compile(translate(f)).match, "/" in f) for f in filters]
+        filtered: Dict[str, List[int]] = {}
+        root = _DirNode("")
+        nodes = {"": root}  # directory nodes by path, without the trailing "/"
+        leaves: List[Optional[_DirNode]] = []  # directory of each option, None if filtered
+
+        for idx, path in enumerate(paths):
+            dirname, _, name = path.rpartition("/")
+            pattern = next(
+                (f for f, match, full in matchers if match(path if full else name)), None
+            )
+            if pattern is not None:
+                filtered.setdefault(pattern, []).append(idx)
+                leaves.append(None)
+                continue
+
+            node = nodes.get(dirname)
+            if node is None:
+                # create the missing directories from the deepest existing one
+                missing = [dirname]
+                parent_path = dirname.rpartition("/")[0]
+                while parent_path not in nodes:
+                    missing.append(parent_path)
+                    parent_path = parent_path.rpartition("/")[0]
+                node = nodes[parent_path]
+                for dir_path in reversed(missing):
+                    child = _DirNode(f"{dir_path}/")
+                    node.dirs[dir_path] = child
+                    nodes[dir_path] = node = child
+            node.files.append(idx)
+            leaves.append(node)
+
+        # expand directories with the fewest entries first, while the rows fit
+        root.expanded = True
+        rows = len(filtered) + root.entries
+        heap = [(d.entries, d.path, d) for d in root.dirs.values()]
+        heapq.heapify(heap)
+        while heap:
+            entries, _, node = heapq.heappop(heap)
+            if entries > 1 and rows + entries - 1 > max_rows:
+                continue
+            node.expanded = True
+            rows += entries - 1
+            for d in node.dirs.values():
+                heapq.heappush(heap, (d.entries, d.path, d))
+
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            for d in node.dirs.values():
+                d.group = node.group or (None if d.expanded else d)
+                stack.append(d)
+
+        # rows in the order of their first option
+        result: List[Tuple[str, List[int]]] = []
+        groups: Dict[_DirNode, List[int]] = {}
+        for idx, node in enumerate(leaves):
+            if node is None:
+                continue
+            group = node.group
+            if group is None:
+                result.append((self._options[idx], [idx]))
+            elif group in groups:
+                groups[group].append(idx)
+            else:
+                groups[group] = [idx]
+                result.append((group.path, groups[group]))
+
+        result.extend((pattern, indices) for pattern, indices in filtered.items())
+        return result
+
+    def _split_partly_checked(self):
+        rows: List[Tuple[str, List[int]]] = []
+        for label, indices in self._rows:
+            checked = [idx for idx in indices if self._states[idx]]
+            if 0 < len(checked) < len(indices):
+                unchecked = [idx for idx in indices if not self._states[idx]]
+                for part in (checked, unchecked):
+                    self._split[len(rows)] = len(indices)
+                    rows.append((label, part))
+            else:
+                rows.append((label, indices))
+        self._rows = rows
+
+    @property
+    def selections(self) -> Optional[List[int]]:
+        """
+        Get the indices of selected options
+        """
+        return self._selections
+
+    @property
+    def options(self) -> List[str]:
+        """
+        Get the options
+        """
+        return self._options
+
+    def _in_chatmark(self) -> str:
+        """
+        Generate ChatMark syntax for the rows
+        Use the index of row to generate id/key
+        """
+        lines = []
+
+        if self._title:
+            lines.append(self._title)
+
+        for row, (key, (label, indices)) in enumerate(zip(self._keys, self._rows)):
+            checked = all(self._states[idx] for idx in indices)
+            mark = "[x]" if checked else "[]"
+            if len(indices) > 1 or label != self._options[indices[0]]:
+                count = len(indices)
+                files = f"{count} {'file' if count == 1 else 'files'}"
+                if row in self._split:
+                    files = f"{count} of {self._split[row]} files" if checked else f"other {files}"
+                label = f"{label} ({files})"
+            lines.append(f"> {mark}({key}) {label}")
+
+        text = "\n".join(lines)
+        return text
+
+    def _parse_response(self, response: Dict):
+        selections = []
+        for key, value in response.items():
+            # keys of other widgets are not in the index
+            row = self._key_index.get(key)
+            if row is not None and value == "checked":
+                selections.extend(self._rows[row][1])
+
+        self._selections = sorted(selections)
+
+
 class TextEditor(Widget):
     """
     ChatMark syntax:
@@ -0,0 +1,35 @@
+from .chunks import split_diff, split_file_diffs
+from .map_reduce import OMITTED_SUMMARIES_HEADER, summarize_diff
+from .prompt import (
+    completion,
+    fit_diff,
+    parse_cache_flag,
+    prompt_token_limit,
+    prompt_too_large,
+    prune_for_prompt,
+)
+from .prune import PrunedDiff, decode_diff, prune_diff
+from .staging import git_pathspec_batch
+from .summary_cache import SummaryCache
+from .tokens import estimate_tokens, get_token_counter, model_input_limit
+
+__all__ = [
+    "OMITTED_SUMMARIES_HEADER",
+    "PrunedDiff",
+    "SummaryCache",
+    "completion",
+    "decode_diff",
+    "estimate_tokens",
+    "fit_diff",
+    "get_token_counter",
+    "git_pathspec_batch",
+    "model_input_limit",
+    "parse_cache_flag",
+    "prompt_token_limit",
+    "prompt_too_large",
+    "prune_diff",
+    "prune_for_prompt",
+    "split_diff",
+    "split_file_diffs",
+    "summarize_diff",
+]
@@ -0,0 +1,96 @@
+from typing import List
+
+from .tokens import TokenCounter, estimate_tokens
+
+
+def split_file_diffs(diff: str) -> List[str]:
+    """
+    Split the output of git diff into the diffs of each file.
+    """
+    files: List[str] = []
+    start = 0
+    pos = diff.find("diff --git ")
+    while pos >= 0:
+        if pos > start:
+            files.append(diff[start:pos])
+        start = pos
+        pos = diff.find("\ndiff --git ", pos + 1)
+        if pos >= 0:
+            pos += 1
+    if diff[start:]:
+        files.append(diff[start:])
+    return files
+
+
+def _split_hunks(file_diff: str) -> List[str]:
+    """
+    Split a file diff into its header (diff --git, index, ---, +++ lines) and hunks.
+    """
+    lines = file_diff.splitlines(keepends=True)
+    parts: List[List[str]] = [[]]
+    for line in lines:
+        if line.startswith("@@") and parts[-1] and (len(parts) > 1 or parts[0]):
+            parts.append([])
+        parts[-1].append(line)
+    return ["".join(p) for p in parts]
+
+
+def _split_lines(header: str, text: str, max_tokens: int, count_tokens: TokenCounter) -> List[str]:
+    """
+    Split a hunk too large for a chunk at line boundaries, each piece under the file header.
+    """
+    pieces: List[str] = []
+    current: List[str] = []
+    budget = max(1, max_tokens - count_tokens(header))
+    size = 0
+    for line in text.splitlines(keepends=True):
+        line_size = count_tokens(line)
+        if current and size + line_size > budget:
+            pieces.append(header + "".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += line_size
+    if current:
+        pieces.append(header + "".join(current))
+    return pieces
+
+
+def split_diff(
+    diff: str, max_tokens: int, count_tokens: TokenCounter = estimate_tokens
+) -> List[str]:
+    """
+    Split the output of git diff into chunks of at most max_tokens each, in order.
+
+    Files are kept whole when they fit, otherwise they are split by hunk,
+    and hunks too large by lines. Each piece of a file repeats its header.
+    Consecutive files and pieces are packed together while they fit.
+    """
+    pieces: List[str] = []
+    for file_diff in split_file_diffs(diff):
+        if count_tokens(file_diff) <= max_tokens:
+            pieces.append(file_diff)
+            continue
+
+        header, *hunks = _split_hunks(file_diff)
+        if not hunks:
+            pieces.extend(_split_lines("", header, max_tokens, count_tokens))
+            continue
+        for hunk in hunks:
+            if count_tokens(header + hunk) <= max_tokens:
+                pieces.append(header + hunk)
+            else:
+                pieces.extend(_split_lines(header, hunk, max_tokens, count_tokens))
+
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for piece in pieces:
+        piece_size = count_tokens(piece)
+        if current and size + piece_size > max_tokens:
+            chunks.append("".join(current))
+            current, size = [], 0
+        current.append(piece)
+        size += piece_size
+    if current:
+        chunks.append("".join(current))
+    return chunks
@@ -0,0 +1,166 @@
+import contextvars
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+from .chunks import split_diff, split_file_diffs
+from .summary_cache import SummaryCache
+from .tokens import TokenCounter, estimate_tokens
+
+DEFAULT_CHUNK_TOKENS = 3000
+DEFAULT_MAX_WORKERS = 4
+
+CHUNK_SUMMARY_PROMPT = """\
+The code changes below are part {index} of {count} of a commit too large to read at once.
+Summarize what they change and why it likely matters, in at most 5 short lines \
+starting with "-", naming the files and the main functions or settings involved. \
+Answer with the lines only.
+
+```
+{diff}
+```
+"""
+# bump when CHUNK_SUMMARY_PROMPT changes, cached summaries are keyed by it
+CHUNK_SUMMARY_PROMPT_VERSION = "1"
+
+SUMMARIES_HEADER = (
+    "The diff is too large to be shown. "
+    "Here are summaries of its parts, in the order of the diff:\n\n"
+)
+
+# for the summaries of the changes left out of a pruned diff
+OMITTED_SUMMARIES_HEADER = (
+    "\nSummaries of the changes not shown above, in the order of the diff:\n\n"
+)
+
+
+def max_workers_from_env() -> int:
+    """
+    Number of chunks summarized at once, set by DEVCHAT_COMMIT_MAX_WORKERS.
+    """
+    try:
+        return max(1, int(os.environ.get("DEVCHAT_COMMIT_MAX_WORKERS", "")))
+    except ValueError:
+        return DEFAULT_MAX_WORKERS
+
+
+def summarize_chunks(
+    chunks: List[str],
+    complete: Callable[[str], str],
+    max_workers: int,
+    language_prompt: str = "",
+) -> List[str]:
+    """
+    Summarize the chunks concurrently, return the summaries in order.
+    """
+    prompts = [
+        CHUNK_SUMMARY_PROMPT.format(index=i + 1, count=len(chunks), diff=chunk) + language_prompt
+        for i, chunk in enumerate(chunks)
+    ]
+    if len(prompts) <= 1:
+        return [complete(prompt) for prompt in prompts]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(prompts))) as executor:
+        # each call in a copy of the context, to be traced under the current span
+        futures = [
+            executor.submit(contextvars.copy_context().run, complete, prompt) for prompt in prompts
+        ]
+        return [future.result() for future in futures]
+
+
+def summarize_diff(
+    diff: str,
+    complete: Callable[[str], str],
+    chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+    max_workers: Optional[int] = None,
+    count_tokens: TokenCounter = estimate_tokens,
+    language_prompt: str = "",
+    max_tokens: Optional[int] = None,
+    header: str = SUMMARIES_HEADER,
+    cache: Optional[SummaryCache] = None,
+) -> str:
+    """
+    Map-reduce a diff too large for one prompt into a text to use in its place.
+
+    The diff is split into chunks of at most chunk_tokens, which are summarized
+    concurrently by complete(prompt) -> answer. If the summaries together are
+    still larger than max_tokens, they are summarized again the same way.
+
+    max_workers: chunks summarized at once, from DEVCHAT_COMMIT_MAX_WORKERS by default
+    max_tokens: size of the summaries returned, chunk_tokens by default
+    header: put before the summaries
+    cache: with a cache, each file is summarized on its own and its summary
+        reused while the file's blobs and hunks stay the same
+    """
+    if max_workers is None:
+        max_workers = max_workers_from_env()
+    if max_tokens is None:
+        max_tokens = chunk_tokens
+
+    if cache is None:
+        chunks = split_diff(diff, chunk_tokens, count_tokens)
+        summaries = summarize_chunks(chunks, complete, max_workers, language_prompt)
+    else:
+        summaries = _summarize_files(
+            diff, complete, cache, chunk_tokens, max_workers, count_tokens, language_prompt
+        )
+
+    while True:
+        parts = [f"Part {i + 1}:\n{s.strip()}\n\n" for i, s in enumerate(summaries)]
+        text = "".join(parts)
+        if count_tokens(text) <= max_tokens:
+            return header + text
+        packed = _pack(parts, chunk_tokens, count_tokens)
+        if len(packed) >= len(summaries):
+            # the summaries don't get shorter, use them as they are
+            return header + text
+        summaries = summarize_chunks(packed, complete, max_workers, language_prompt)
+
+
+def _summarize_files(
+    diff: str,
+    complete: Callable[[str], str],
+    cache: SummaryCache,
+    chunk_tokens: int,
+    max_workers: int,
+    count_tokens: TokenCounter,
+    language_prompt: str,
+) -> List[str]:
+    """
+    Summarize each file of the diff, only the files without a cached summary.
+    """
+    language = hashlib.sha1(language_prompt.encode("utf-8")).hexdigest()[:8]
+    prompt_version = f"{CHUNK_SUMMARY_PROMPT_VERSION}:{language}"
+
+    summaries: List[Optional[str]] = []
+    keys: List[Optional[str]] = []
+    missing: List[Tuple[int, List[str]]] = []  # file index, chunks of the file
+    for index, file_diff in enumerate(split_file_diffs(diff)):
+        key = cache.key(file_diff, prompt_version)
+        summary = cache.get(key)
+        keys.append(key)
+        summaries.append(summary)
+        if summary is None:
+            missing.append((index, split_diff(file_diff, chunk_tokens, count_tokens)))
+
+    chunks = [chunk for _, file_chunks in missing for chunk in file_chunks]
+    answers = iter(summarize_chunks(chunks, complete, max_workers, language_prompt))
+    for index, file_chunks in missing:
+        summary = "\n".join(next(answers).strip() for _ in file_chunks)
+        summaries[index] = summary
+        cache.put(keys[index], summary)
+    cache.save()
+    return [summary or "" for summary in summaries]
+
+
+def _pack(parts: List[str], max_tokens: int, count_tokens: TokenCounter) -> List[str]:
+    chunks: List[str] = []
+    current = ""
+    for part in parts:
+        if current and count_tokens(current + part) > max_tokens:
+            chunks.append(current)
+            current = ""
+        current += part
+    if current:
+        chunks.append(current)
+    return chunks
@@ -0,0 +1,113 @@
+from typing import Callable, Dict, Optional, Tuple, Union
+
+from .map_reduce import OMITTED_SUMMARIES_HEADER, summarize_diff
+from .prune import PrunedDiff, prune_diff
+from .summary_cache import SummaryCache
+from .tokens import get_token_counter, model_input_limit
+
+# input tokens of the model when ~/.chat/config.yml does not set its max_input_tokens
+COMMIT_PROMPT_LIMIT_TOKENS = 5000
+# tokens left for the chat format around the prompt
+PROMPT_TOKEN_MARGIN = 100
+# in the user input, summarize all changes again instead of reusing cached summaries
+NO_CACHE_FLAG = "--no-cache"
+
+
+def prompt_token_limit(model: str) -> int:
+    return model_input_limit(model, COMMIT_PROMPT_LIMIT_TOKENS)
+
+
+def prompt_too_large(prompt: str, model: str) -> bool:
+    return get_token_counter(model)(prompt) > prompt_token_limit(model)
+
+
+def parse_cache_flag(user_input: str) -> Tuple[str, bool]:
+    """
+    Remove --no-cache from the user input, return (user input, whether to use the summary cache).
+    """
+    words = user_input.split()
+    if NO_CACHE_FLAG not in words:
+        return user_input, True
+    return " ".join(word for word in words if word != NO_CACHE_FLAG), False
+
+
+def completion(request: Callable[[str], Dict]) -> Callable[[str], str]:
+    """
+    Turn request(prompt) -> response of chat_completion_stream into complete(prompt) -> text.
+    """
+
+    def complete(prompt: str) -> str:
+        response = request(prompt)
+        if not response.get("content", None):
+            raise RuntimeError(response.get("error", None) or "No response from the model")
+        return response["content"]
+
+    return complete
+
+
+def prune_for_prompt(
+    diff: Union[bytes, str],
+    build_prompt: Callable[[str], str],
+    model: str,
+    reserve: int = 0,
+) -> PrunedDiff:
+    """
+    Prune the diff to what fits in build_prompt(diff text) for the model.
+
+    reserve: tokens kept for other content, e.g. summaries
+    """
+    count_tokens = get_token_counter(model)
+    budget = (
+        prompt_token_limit(model) - count_tokens(build_prompt("")) - PROMPT_TOKEN_MARGIN - reserve
+    )
+    return prune_diff(diff, budget, count_tokens)
+
+
+def _report_omitted(pruned: PrunedDiff, language: str):
+    if not pruned.omitted:
+        return
+    lines = "".join(f"- {omitted.describe()}\n" for omitted in pruned.omitted)
+    title = "未提供给模型的修改：\n" if language == "zh" else "Not shown to the model:\n"
+    print(title + lines, flush=True)
+
+
+def fit_diff(
+    diff: Union[bytes, str],
+    build_prompt: Callable[[str], str],
+    model: str,
+    complete: Callable[[str], str],
+    language: str = "en",
+    cache: Optional[SummaryCache] = None,
+) -> str:
+    """
+    Return the text to put in build_prompt(text) for the diff of a commit.
+
+    The diff is pruned to the model's input limit. Changes left out for
+    the size are summarized with complete(prompt) -> text, in a quarter of
+    the limit. What was left out is listed after the diff and shown to the
+    user.
+    """
+    pruned = prune_for_prompt(diff, build_prompt, model)
+    summaries = ""
+    if pruned.overflow:
+        # keep room to summarize the hunks left out for the length limit
+        summary_tokens = prompt_token_limit(model) // 4
+        pruned = prune_for_prompt(diff, build_prompt, model, reserve=summary_tokens)
+        if language == "zh":
+            print("修改内容过长，正在分块总结其余部分...\n", flush=True)
+        else:
+            print(
+                "The changes are too large for one request, summarizing the rest in parts...\n",
+                flush=True,
+            )
+        summaries = summarize_diff(
+            pruned.overflow,
+            complete,
+            count_tokens=get_token_counter(model),
+            language_prompt="You must response in chinese。\n" if language == "zh" else "",
+            max_tokens=summary_tokens,
+            header=OMITTED_SUMMARIES_HEADER,
+            cache=cache,
+        )
+    _report_omitted(pruned, language)
+    return pruned.text + pruned.report() + summaries
@@ -0,0 +1,334 @@
+import fnmatch
+import posixpath
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Set, Union
+
+from .chunks import _split_hunks, split_file_diffs
+from .tokens import TokenCounter, estimate_tokens
+
+LOCKFILES = {
+    "package-lock.json",
+    "npm-shrinkwrap.json",
+    "yarn.lock",
+    "pnpm-lock.yaml",
+    "bun.lockb",
+    "poetry.lock",
+    "Pipfile.lock",
+    "uv.lock",
+    "Cargo.lock",
+    "Gemfile.lock",
+    "composer.lock",
+    "go.sum",
+    "mix.lock",
+    "pubspec.lock",
+    "Podfile.lock",
+    "packages.lock.json",
+}
+
+GENERATED_PATTERNS = [
+    "*.min.js",
+    "*.min.css",
+    "*.map",
+    "*_pb2.py",
+    "*_pb2_grpc.py",
+    "*.pb.go",
+    "*.pb.cc",
+    "*.pb.h",
+    "*.g.dart",
+    "*.snap",
+    "*.svg",
+]
+
+# markers of generated files, looked for in the first added lines
+GENERATED_MARKERS = ("@generated", "DO NOT EDIT", "Code generated by", "auto-generated")
+
+# entries listed one by one in the report, the others are counted together
+MAX_REPORTED_FILES = 40
+
+_GENERATED_RE = re.compile("|".join(fnmatch.translate(p) for p in GENERATED_PATTERNS))
+_DIFF_GIT_RE = re.compile(r"^diff --git a/(.*) b/(.*)$", re.MULTILINE)
+_NEW_PATH_RE = re.compile(r"^\+\+\+ b/(.*)$", re.MULTILINE)
+_OLD_PATH_RE = re.compile(r"^--- a/(.*)$", re.MULTILINE)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+@dataclass
+class Omitted:
+    """
+    Changes of a file left out of the pruned diff.
+    """
+
+    path: str
+    reason: str  # lockfile, generated, binary, whitespace or size
+    hunks: int
+    total_hunks: int
+    added: int
+    removed: int
+
+    def describe(self) -> str:
+        if self.reason == "binary":
+            return f"{self.path}: binary file"
+        counts = f"(+{self.added} -{self.removed})"
+        if self.reason in ("lockfile", "generated"):
+            label = "lockfile" if self.reason == "lockfile" else "generated file"
+            if self.hunks < self.total_hunks:
+                return (
+                    f"{self.path}: {self.hunks} of {self.total_hunks} hunks of the {label} {counts}"
+                )
+            return f"{self.path}: {label} {counts}"
+        if not self.total_hunks:
+            return f"{self.path}: changed without content changes, not shown"
+        if self.hunks < self.total_hunks:
+            changes = f"{self.hunks} of {self.total_hunks} hunks"
+        else:
+            changes = "all changes"
+        if self.reason == "whitespace":
+            return f"{self.path}: {changes} only change whitespace"
+        return f"{self.path}: {changes} {counts}, too large to be shown"
+
+
+@dataclass
+class PrunedDiff:
+    """
+    A diff pruned to a token budget.
+
+    text: the files and hunks kept, in the order of the diff
+    omitted: what was left out and why
+    overflow: the hunks left out for the budget only, under their file
+        headers, e.g. to be summarized
+    reported: entries of omitted listed one by one in the report, the
+        others are counted together, no report when negative
+    """
+
+    text: str
+    omitted: List[Omitted] = field(default_factory=list)
+    overflow: str = ""
+    reported: int = MAX_REPORTED_FILES
+
+    def report(self) -> str:
+        """
+        The list of the changes left out, to put after the diff.
+        """
+        if not self.omitted or self.reported < 0:
+            return ""
+        lines = [f"- {o.describe()}\n" for o in self.omitted[: self.reported]]
+        rest = self.omitted[self.reported :]
+        if rest:
+            more = "more files" if lines else "files"
+            lines.append(
+                f"- {len(rest)} {more} (+{sum(o.added for o in rest)} "
+                f"-{sum(o.removed for o in rest)})\n"
+            )
+        return "\nChanges not shown in the diff above:\n" + "".join(lines)
+
+
+@dataclass
+class _FileDiff:
+    path: str
+    header: str
+    hunks: List[str]
+    kind: str  # code, lockfile, generated or binary
+    added: int = 0
+    removed: int = 0
+    whitespace: Set[int] = field(default_factory=set)  # hunks only changing whitespace
+
+
+def decode_diff(diff: Union[bytes, str]) -> str:
+    """
+    Text of the output of git diff, which may not be valid utf-8.
+    """
+    if isinstance(diff, bytes):
+        return diff.decode("utf-8", errors="replace")
+    return diff
+
+
+def _file_path(header: str) -> str:
+    for regex in (_NEW_PATH_RE, _OLD_PATH_RE, _DIFF_GIT_RE):
+        match = regex.search(header)
+        if match:
+            return match.group(match.lastindex).strip()
+    return header.split("\n", 1)[0]
+
+
+def _count_changes(hunk: str):
+    added = removed = 0
+    for line in hunk.splitlines()[1:]:
+        if line.startswith("+"):
+            added += 1
+        elif line.startswith("-"):
+            removed += 1
+    return added, removed
+
+
+def _classify(path: str, header: str, hunks: List[str]) -> str:
+    if "\nGIT binary patch" in header or re.search(r"^Binary files ", header, re.MULTILINE):
+        return "binary"
+    name = posixpath.basename(path)
+    if name in LOCKFILES or name.endswith(".lock"):
+        return "lockfile"
+    if _GENERATED_RE.match(name):
+        return "generated"
+    if hunks:
+        head = [line for line in hunks[0].splitlines()[1:12] if line.startswith("+")]
+        if any(marker in line for line in head for marker in GENERATED_MARKERS):
+            return "generated"
+    return "code"
+
+
+def _parse(diff: str) -> List[_FileDiff]:
+    files = []
+    for file_diff in split_file_diffs(diff):
+        header, *hunks = _split_hunks(file_diff)
+        path = _file_path(header)
+        parsed = _FileDiff(path, header, hunks, _classify(path, header, hunks))
+        for index, hunk in enumerate(hunks):
+            added, removed = _count_changes(hunk)
+            parsed.added += added
+            parsed.removed += removed
+            if parsed.kind == "code" and _is_whitespace_only(hunk):
+                parsed.whitespace.add(index)
+        files.append(parsed)
+    return files
+
+
+def _is_whitespace_only(hunk: str) -> bool:
+    """
+    Whether the hunk only changes whitespace, including blank lines.
+
+    The lines are compared in order, a hunk reordering lines changes behavior.
+    """
+    added: List[str] = []
+    removed: List[str] = []
+    for line in hunk.splitlines()[1:]:
+        if line[:1] == "+":
+            added.append(_WHITESPACE_RE.sub("", line[1:]))
+        elif line[:1] == "-":
+            removed.append(_WHITESPACE_RE.sub("", line[1:]))
+    return list(filter(None, added)) == list(filter(None, removed))
+
+
+def _information(hunk: str) -> int:
+    """
+    Number of changed lines with more than whitespace and punctuation.
+    """
+    score = 0
+    for line in hunk.splitlines()[1:]:
+        if line[:1] in ("+", "-") and sum(c.isalnum() for c in line) > 2:
+            score += 1
+    return score
+
+
+# order in which the changes are left out when the diff is over budget, last first
+_CODE, _NO_CONTENT, _WHITESPACE = 0, 1, 2
+_KIND_TIERS = {"generated": 3, "binary": 4, "lockfile": 5}
+
+
+def prune_diff(
+    diff: Union[bytes, str],
+    budget: int,
+    count_tokens: TokenCounter = estimate_tokens,
+) -> PrunedDiff:
+    """
+    Prune a diff to at most budget tokens, keeping its most informative hunks.
+
+    A diff within the budget is kept whole. Otherwise hunks are taken by
+    priority while they fit: the hunks of source files first, ranked by the
+    changed lines they show per token and taken breadth first (the best
+    hunk of each file, then the second best, etc.), then renames and mode
+    changes, hunks that only change whitespace, generated files, binary
+    files and lockfiles last.
+    The report of what was left out is counted in the budget, it lists
+    fewer files when it does not fit beside the diff, and is left out
+    when not even its count of the files fits.
+    """
+    files = _parse(decode_diff(diff))
+
+    candidates = []  # (tier, round, -density, file index, hunk index or -1, tokens)
+    for f_index, file in enumerate(files):
+        if not file.hunks:
+            tier = _KIND_TIERS.get(file.kind, _NO_CONTENT)
+            candidates.append((tier, 0, 0.0, f_index, -1, 0))
+            continue
+
+        ranked = []
+        for h_index, hunk in enumerate(file.hunks):
+            tokens = count_tokens(hunk)
+            if file.kind != "code":
+                tier = _KIND_TIERS[file.kind]
+            else:
+                tier = _WHITESPACE if h_index in file.whitespace else _CODE
+            ranked.append((tier, -_information(hunk) / max(tokens, 1), h_index, tokens))
+        ranked.sort()
+        for rank, (tier, density, h_index, tokens) in enumerate(ranked):
+            candidates.append((tier, rank, density, f_index, h_index, tokens))
+    candidates.sort()
+
+    header_tokens = [count_tokens(file.header) for file in files]
+    limit = budget
+    while True:
+        kept = _select(candidates, header_tokens, limit)
+        result = _assemble(files, kept)
+        # the report grows with what is left out, select again with less room
+        over = count_tokens(result.text) + count_tokens(result.report()) - budget
+        if over <= 0:
+            return result
+        if not kept:
+            break
+        limit -= over
+
+    # the report alone is over budget, list the files it can
+    while result.reported >= 0 and count_tokens(result.report()) > budget:
+        result.reported = min(result.reported, len(result.omitted)) - 1
+    return result
+
+
+def _omitted(file: _FileDiff, reason: str, hunks: List[str]) -> Omitted:
+    added = removed = 0
+    for hunk in hunks:
+        hunk_added, hunk_removed = _count_changes(hunk)
+        added += hunk_added
+        removed += hunk_removed
+    return Omitted(file.path, reason, len(hunks), len(file.hunks), added, removed)
+
+
+def _select(candidates, header_tokens: List[int], limit: int) -> Dict[int, Set[int]]:
+    kept: Dict[int, Set[int]] = {}  # file index -> indexes of the hunks kept
+    used = 0
+    for _, _, _, f_index, h_index, tokens in candidates:
+        cost = tokens if f_index in kept else tokens + header_tokens[f_index]
+        if used + cost > limit:
+            continue
+        hunks = kept.setdefault(f_index, set())
+        if h_index >= 0:
+            hunks.add(h_index)
+        used += cost
+    return kept
+
+
+def _assemble(files: List[_FileDiff], kept: Dict[int, Set[int]]) -> PrunedDiff:
+    text: List[str] = []
+    overflow: List[str] = []
+    omitted: List[Omitted] = []
+    for f_index, file in enumerate(files):
+        hunks = kept.get(f_index)
+        if hunks is not None:
+            text.append(file.header)
+            text.extend(file.hunks[i] for i in sorted(hunks))
+            hunks_left_out = [i for i in range(len(file.hunks)) if i not in hunks]
+        else:
+            hunks_left_out = list(range(len(file.hunks)))
+
+        if file.kind != "code":
+            if hunks is None or hunks_left_out:
+                omitted.append(_omitted(file, file.kind, [file.hunks[i] for i in hunks_left_out]))
+            continue
+
+        whitespace = [file.hunks[i] for i in hunks_left_out if i in file.whitespace]
+        if whitespace:
+            omitted.append(_omitted(file, "whitespace", whitespace))
+        dropped = [file.hunks[i] for i in hunks_left_out if i not in file.whitespace]
+        if dropped or (hunks is None and not file.hunks):
+            omitted.append(_omitted(file, "size", dropped))
+            overflow.append(file.header + "".join(dropped))
+    return PrunedDiff("".join(text), omitted, "".join(overflow))
@@ -0,0 +1,20 @@
+import os
+import subprocess
+from typing import List, Sequence
+
+
+def git_pathspec_batch(args: List[str], files: Sequence[str]):
+    """
+    Run git with args on all files in one process, passing the paths NUL separated on stdin.
+
+    Raises CalledProcessError on git before 2.25, which has no
+    --pathspec-from-file, or when a path does not match. git leaves the
+    index unchanged then, callers can fall back to one file at a time.
+    """
+    subprocess.run(
+        ["git", *args, "--pathspec-from-file=-", "--pathspec-file-nul"],
+        input=b"\0".join(os.fsencode(file) for file in files),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        check=True,
+    )
@@ -0,0 +1,106 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+from lib.ide_service.file_cache import get_cache_dir, read_json, write_json
+
+CACHE_NAME = "commit_summaries"
+
+# LRU limits of the cache, by entries and by characters of the summaries
+DEFAULT_MAX_ENTRIES = 2000
+DEFAULT_MAX_CHARS = 2_000_000
+
+_INDEX_RE = re.compile(r"^index ([0-9a-f]+)\.\.([0-9a-f]+)", re.MULTILINE)
+_HUNK_HEADER_RE = re.compile(r"^@@ [^@]* @@", re.MULTILINE)
+
+
+class SummaryCache:
+    """
+    Summaries of the changes of files, kept across runs of the commit workflows.
+
+    An entry is keyed by the blobs of the file before and after the change
+    (from the index line of its diff), the hunks summarized, the model and
+    the version of the summary prompt, so that a rerun only summarizes the
+    files changed since. Entries live in the workspace's
+    .chat/workflows/local_cache/commit_summaries, the least recently used are
+    dropped beyond max_entries or max_chars.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        name: str = CACHE_NAME,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_chars: int = DEFAULT_MAX_CHARS,
+    ):
+        self.model = model
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self.path = os.path.join(get_cache_dir(name), "summaries.json")
+        self.hits = 0
+        self.misses = 0
+        # key -> [summary, last used time]
+        self._entries: Optional[Dict[str, List]] = None
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def key(self, file_diff: str, prompt_version: str) -> Optional[str]:
+        """
+        Key of the summary of a file diff, None if it has no blob ids to key on.
+        """
+        match = _INDEX_RE.search(file_diff)
+        if match is None:
+            return None
+        old_blob, new_blob = match.groups()
+        hunks = "\n".join(_HUNK_HEADER_RE.findall(file_diff))
+        parts = [old_blob, new_blob, self.model, prompt_version, hunks]
+        return hashlib.sha1("\0".join(parts).encode("utf-8")).hexdigest()
+
+    def _load(self) -> Dict[str, List]:
+        if self._entries is None:
+            data = read_json(self.path)
+            entries = data.get("entries") if isinstance(data, dict) else None
+            self._entries = entries if isinstance(entries, dict) else {}
+        return self._entries
+
+    def get(self, key: Optional[str]) -> Optional[str]:
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._load().get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry[1] = time.time()
+            self._dirty = True
+            return entry[0]
+
+    def put(self, key: Optional[str], summary: str):
+        if key is None or not summary:
+            return
+        with self._lock:
+            self._load()[key] = [summary, time.time()]
+            self._dirty = True
+
+    def save(self):
+        """
+        Write the entries used or added, after dropping the least recently used.
+        """
+        with self._lock:
+            if not self._dirty or self._entries is None:
+                return
+            recent = sorted(self._entries.items(), key=lambda item: item[1][1], reverse=True)
+            kept: Dict[str, List] = {}
+            chars = 0
+            for key, entry in recent[: self.max_entries]:
+                chars += len(entry[0])
+                if chars > self.max_chars:
+                    break
+                kept[key] = entry
+            self._entries = kept
+            self._dirty = False
+            write_json(self.path, {"entries": kept})
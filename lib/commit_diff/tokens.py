@@ -0,0 +1,59 @@
+import os
+from functools import lru_cache
+from typing import Callable, Optional
+
+# counts the tokens of a text
+TokenCounter = Callable[[str], int]
+
+# encoding of models tiktoken does not know
+DEFAULT_ENCODING = "cl100k_base"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count, about 4 characters per token for code and English.
+    """
+    return (len(text) + 3) // 4
+
+
+@lru_cache(maxsize=None)
+def get_token_counter(model: Optional[str] = None) -> TokenCounter:
+    """
+    Token counter of the model's tokenizer.
+
+    Uses tiktoken when it is installed and its encodings can be loaded,
+    estimate_tokens otherwise.
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return estimate_tokens
+
+    try:
+        try:
+            encoding = tiktoken.encoding_for_model(model or "")
+        except KeyError:
+            encoding = tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception:
+        # the encoding files are downloaded on first use, which may fail offline
+        return estimate_tokens
+
+    def count_tokens(text: str) -> int:
+        return len(encoding.encode(text, disallowed_special=()))
+
+    return count_tokens
+
+
+def model_input_limit(model: str, default: int) -> int:
+    """
+    max_input_tokens of the model in ~/.chat/config.yml, default if not set.
+    """
+    config_file = os.path.expanduser("~/.chat/config.yml")
+    try:
+        import yaml
+
+        with open(config_file, "r", encoding="utf-8") as file:
+            config = yaml.safe_load(file) or {}
+        return int(config.get("models", {})[model]["max_input_tokens"])
+    except Exception:
+        return default
@@ -1,7 +1,16 @@
+from .async_service import AsyncIDEService
+from .file_view import FileView, get_file_view
 from .service import IDEService
+from .symbol_table import SymbolTable
+from .transport import get_transport
 from .types import *  # noqa: F403
 from .types import __all__ as types_all
 
 __all__ = types_all + [
     "IDEService",
+    "AsyncIDEService",
+    "SymbolTable",
+    "FileView",
+    "get_file_view",
+    "get_transport",
 ]
@@ -0,0 +1,66 @@
+import asyncio
+import contextvars
+from functools import partial, update_wrapper
+from typing import Any, Callable, Optional
+
+from .service import IDEService
+
+DEFAULT_MAX_CONCURRENCY = 8
+
+# IDEService methods mirrored besides the RPC methods
+_MIRRORED_HELPERS = ("get_visible_range", "get_selected_range", "editor_snapshot", "ide_logging")
+
+
+class AsyncIDEService:
+    """
+    Asyncio client for IDE service
+
+    Mirrors the RPC methods of IDEService as coroutines. Each call runs in the
+    event loop's executor over the shared pooled transport, and at most
+    max_concurrency calls are in flight at a time.
+
+    Usage:
+    client = AsyncIDEService()
+    symbols, locations = await asyncio.gather(
+        client.get_document_symbols(abspath),
+        client.find_def_locations(abspath, 1, 4),
+    )
+    """
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        self._max_concurrency = max_concurrency
+        # created lazily to bind to the running loop
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def run(self, fn: Callable[[IDEService], Any]) -> Any:
+        """
+        Run fn(client) with a new IDEService client in the executor, like the
+        mirrored methods, e.g. to consume a streamed result without blocking the loop.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+
+        async with self._semaphore:
+            # a new IDEService per call, its _result must not be shared between threads
+            client = IDEService()
+            loop = asyncio.get_event_loop()
+            # run in a copy of the context, the call is recorded under the current span
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(None, context.run, partial(fn, client))
+
+    async def _call(self, name: str, *args, **kwargs):
+        return await self.run(lambda client: getattr(client, name)(*args, **kwargs))
+
+
+def _mirror(name: str):
+    async def coroutine(self: AsyncIDEService, *args, **kwargs):
+        return await self._call(name, *args, **kwargs)
+
+    return update_wrapper(coroutine, getattr(IDEService, name))
+
+
+for _name, _attr in list(vars(IDEService).items()):
+    if _name.startswith("_"):
+        continue
+    if getattr(_attr, "_is_rpc_method", False) or _name in _MIRRORED_HELPERS:
+        setattr(AsyncIDEService, _name, _mirror(_name))
@@ -0,0 +1,192 @@
+"""
+Record/replay of IDE service traffic, to run workflows without an IDE.
+
+Record: DEVCHAT_IDE_SERVICE_RECORD=<cassette path>
+    Every round trip to the IDE service is written to the cassette at exit.
+
+Replay: DEVCHAT_IDE_SERVICE_REPLAY=<cassette path>
+    An in-process stand-in listening on DEVCHAT_IDE_SERVICE_URL (which must be set,
+    e.g. to http://127.0.0.1:3999) serves the recorded responses.
+    DEVCHAT_IDE_SERVICE_REPLAY_LATENCY adds a delay to each response, either in
+    milliseconds or "recorded" to reproduce the recorded durations.
+
+The persistent caches (.chat/workflows/local_cache) are bypassed while recording
+or replaying.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from .memo import make_key
+
+CASSETTE_VERSION = 1
+
+
+class CassetteRecorder:
+    """
+    Collects IDE service interactions and writes them to a cassette at exit.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._interactions: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        atexit.register(self.save)
+
+    def record(
+        self,
+        method: str,
+        params: Dict[str, Any],
+        status: int,
+        response: Dict[str, Any],
+        duration: float,
+    ):
+        interaction = {
+            "method": method,
+            "params": params,
+            "status": status,
+            "response": response,
+            "duration": duration,
+        }
+        with self._lock:
+            self._interactions.append(interaction)
+
+    def save(self):
+        with self._lock:
+            cassette = {"version": CASSETTE_VERSION, "interactions": list(self._interactions)}
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(cassette, f, ensure_ascii=False, indent=1)
+        except OSError:
+            pass
+
+
+def cassette_active() -> bool:
+    """
+    Whether calls are recorded or replayed.
+
+    Persistent caches are then bypassed, so that a recording has every call
+    and a replay does not depend on the cache state of the workspace.
+    """
+    return bool(
+        os.environ.get("DEVCHAT_IDE_SERVICE_RECORD", "")
+        or os.environ.get("DEVCHAT_IDE_SERVICE_REPLAY", "")
+    )
+
+
+_recorder: Optional[CassetteRecorder] = None
+_recorder_lock = threading.Lock()
+
+
+def get_recorder() -> Optional[CassetteRecorder]:
+    """
+    Return the process-wide recorder, None unless recording is enabled.
+    """
+    global _recorder
+    path = os.environ.get("DEVCHAT_IDE_SERVICE_RECORD", "")
+    if path == "":
+        return None
+
+    if _recorder is None:
+        with _recorder_lock:
+            if _recorder is None:
+                _recorder = CassetteRecorder(path)
+    return _recorder
+
+
+def load_cassette(path: str) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        cassette = json.load(f)
+    if cassette.get("version") != CASSETTE_VERSION:
+        raise ValueError(f"Unsupported cassette version: {cassette.get('version')}")
+    return cassette["interactions"]
+
+
+def _make_replay_server(
+    interactions: List[Dict[str, Any]],
+    host: str,
+    port: int,
+    latency: Optional[float],
+):
+    from .stub_server import StubIDEServer
+    from .transport import BATCH_ENDPOINT
+
+    class ReplayServer(StubIDEServer):
+        """
+        Serves recorded interactions.
+
+        Calls are matched by method and params. Repeated identical calls get the
+        recorded responses in order, and the last one once they are used up.
+        """
+
+        def __init__(self):
+            self._queues: Dict[str, Deque[Dict[str, Any]]] = {}
+            for interaction in interactions:
+                key = make_key(interaction["method"], interaction["params"])
+                self._queues.setdefault(key, deque()).append(interaction)
+            self._queues_lock = threading.Lock()
+
+            batch_unsupported = any(
+                i["method"] == BATCH_ENDPOINT and i["status"] == 404 for i in interactions
+            )
+            super().__init__(
+                {}, host=host, port=port, support_batch=not batch_unsupported, latency=0.0
+            )
+
+        def respond(self, method: str, params: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+            with self._queues_lock:
+                queue = self._queues.get(make_key(method, params))
+                if not queue:
+                    return 404, {"error": f"No recorded interaction for {method}"}
+                interaction = queue.popleft() if len(queue) > 1 else queue[0]
+
+            delay = interaction.get("duration", 0.0) if latency is None else latency
+            if delay:
+                time.sleep(delay)
+            return interaction["status"], interaction["response"]
+
+        def start(self):
+            # the environment already points at the bound address
+            self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+            self._thread.start()
+
+    return ReplayServer()
+
+
+_replay_server = None
+_replay_lock = threading.Lock()
+
+
+def start_replay_from_env():
+    """
+    Start the replay stand-in if DEVCHAT_IDE_SERVICE_REPLAY is set and it isn't running.
+    """
+    global _replay_server
+    path = os.environ.get("DEVCHAT_IDE_SERVICE_REPLAY", "")
+    if path == "" or _replay_server is not None:
+        return
+
+    with _replay_lock:
+        if _replay_server is not None:
+            return
+
+        latency_value = os.environ.get("DEVCHAT_IDE_SERVICE_REPLAY_LATENCY", "")
+        if latency_value == "recorded":
+            latency = None
+        else:
+            latency = float(latency_value) / 1000 if latency_value else 0.0
+
+        url = urlparse(os.environ.get("DEVCHAT_IDE_SERVICE_URL", "") or "http://127.0.0.1:0")
+        server = _make_replay_server(
+            load_cassette(path), url.hostname or "127.0.0.1", url.port or 0, latency
+        )
+        os.environ["DEVCHAT_IDE_SERVICE_URL"] = server.url
+        server.start()
+        _replay_server = server
@@ -0,0 +1,356 @@
+import atexit
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .memo import CachePolicy
+from .transport import get_transport
+
+CACHE_DIR_PATH = [".chat", "workflows", "local_cache"]
+
+
+def get_cache_dir(name: str) -> str:
+    """
+    Return the directory of a named cache under the workspace's local cache.
+    """
+    return os.path.join(os.getcwd(), *CACHE_DIR_PATH, name)
+
+
+def path_key(abspath: str) -> str:
+    return hashlib.sha1(abspath.encode("utf-8")).hexdigest()
+
+
+# (abspath, size, mtime_ns) -> content digest, to hash each file version once
+_digests: Dict[Tuple[str, int, int], str] = {}
+_digests_lock = threading.Lock()
+
+
+def _content_digest(abspath: str, size: int, mtime_ns: int) -> str:
+    key = (abspath, size, mtime_ns)
+    with _digests_lock:
+        digest = _digests.get(key)
+    if digest is None:
+        with open(abspath, "rb") as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        with _digests_lock:
+            _digests[key] = digest
+    return digest
+
+
+@dataclass(frozen=True)
+class FileFingerprint:
+    """
+    Identifies a version of a file by its stat and content digest
+    """
+
+    abspath: str
+    size: int
+    mtime_ns: int
+    digest: str
+
+    @classmethod
+    def of(cls, abspath: str) -> Optional["FileFingerprint"]:
+        """
+        Fingerprint the current version of the file, None if it can't be read.
+        """
+        try:
+            st = os.stat(abspath)
+            digest = _content_digest(abspath, st.st_size, st.st_mtime_ns)
+        except OSError:
+            return None
+        return cls(abspath, st.st_size, st.st_mtime_ns, digest)
+
+    def is_current(self) -> bool:
+        """
+        Whether the file still has the fingerprinted content.
+
+        Unchanged size and mtime are trusted, otherwise the content is hashed
+        so that a touched but unmodified file is still current.
+        """
+        try:
+            st = os.stat(self.abspath)
+            if st.st_size != self.size:
+                return False
+            if st.st_mtime_ns == self.mtime_ns:
+                return True
+            return _content_digest(self.abspath, st.st_size, st.st_mtime_ns) == self.digest
+        except OSError:
+            return False
+
+    def to_list(self) -> List[Any]:
+        return [self.abspath, self.size, self.mtime_ns, self.digest]
+
+    @classmethod
+    def from_list(cls, value: List[Any]) -> "FileFingerprint":
+        return cls(*value)
+
+
+def read_json(path: str) -> Optional[Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_json(path: str, data: Any):
+    """
+    Write data atomically, a cache that can't be written is silently skipped.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def _compact_symbols(nodes: List[Dict[str, Any]]) -> List[List[Any]]:
+    """
+    Convert symbol nodes to [name, kind, start line, start char, end line, end char, children]
+    """
+    return [
+        [
+            n["name"],
+            n["kind"],
+            n["range"]["start"]["line"],
+            n["range"]["start"]["character"],
+            n["range"]["end"]["line"],
+            n["range"]["end"]["character"],
+            _compact_symbols(n.get("children") or []),
+        ]
+        for n in nodes
+    ]
+
+
+def _expand_symbols(nodes: List[List[Any]]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "name": name,
+            "kind": kind,
+            "range": {
+                "start": {"line": start_line, "character": start_char},
+                "end": {"line": end_line, "character": end_char},
+            },
+            "children": _expand_symbols(children),
+        }
+        for name, kind, start_line, start_char, end_line, end_char, children in nodes
+    ]
+
+
+class DocumentSymbolCache(CachePolicy):
+    """
+    Persist document symbols of files across runs.
+
+    Entries are keyed by the file's fingerprint (abspath, size, mtime_ns,
+    content digest) and dropped as soon as the file changes.
+    """
+
+    persistent = True
+
+    def __init__(self, name: str = "document_symbols"):
+        self.name = name
+        # fingerprints taken before a call, so that a file changing during the call
+        # doesn't get the old symbols cached for its new content
+        self._pending: Dict[str, FileFingerprint] = {}
+        self._lock = threading.Lock()
+
+    def _entry_path(self, abspath: str) -> str:
+        return os.path.join(get_cache_dir(self.name), f"{path_key(abspath)}.json")
+
+    def get(self, method: str, data: Dict[str, Any]) -> Tuple[bool, Any]:
+        abspath = data.get("abspath")
+        if not abspath:
+            return False, None
+
+        entry = read_json(self._entry_path(abspath))
+        if entry is not None:
+            fingerprint = FileFingerprint.from_list(entry["fingerprint"])
+            if fingerprint.abspath == abspath and fingerprint.is_current():
+                return True, _expand_symbols(entry["symbols"])
+
+        fingerprint = FileFingerprint.of(abspath)
+        if fingerprint is not None:
+            with self._lock:
+                self._pending[abspath] = fingerprint
+        return False, None
+
+    def put(self, method: str, data: Dict[str, Any], result: Any):
+        abspath = data.get("abspath")
+        with self._lock:
+            fingerprint = self._pending.pop(abspath, None)
+        # an empty result may come from a language server still indexing
+        if fingerprint is None or not isinstance(result, list) or not result:
+            return
+
+        try:
+            symbols = _compact_symbols(result)
+        except (KeyError, TypeError):
+            return
+        entry = {"fingerprint": fingerprint.to_list(), "symbols": symbols}
+        write_json(self._entry_path(abspath), entry)
+
+
+class LocationCache(CachePolicy):
+    """
+    Persist definition lookups (find_def_locations, find_type_def_locations) across runs.
+
+    Entries are keyed by (abspath, content digest, line, character) and grouped in
+    one shard per queried file. An entry is dropped when the queried file or any
+    file in its returned locations changes. New entries are kept in memory and
+    the changed shards written by flush(), at exit. Hit ratios are logged to the
+    IDE at exit.
+    """
+
+    persistent = True
+
+    def __init__(self, name: str = "def_locations"):
+        self.name = name
+        self._shards: Dict[str, Dict[str, Any]] = {}
+        self._hits: Dict[str, int] = {}
+        self._lookups: Dict[str, int] = {}
+        self._dirty: Set[str] = set()  # abspaths of the shards changed since the last flush
+        # fingerprints of the queried files taken before a call, keyed by (abspath, entry key),
+        # so that a file changing during the call doesn't get the old result cached
+        self._pending: Dict[Tuple[str, str], List[Any]] = {}
+        self._lock = threading.Lock()
+        atexit.register(self.report)
+        atexit.register(self.flush)
+
+    def _shard_path(self, abspath: str) -> str:
+        return os.path.join(get_cache_dir(self.name), f"{path_key(abspath)}.json")
+
+    def _load_shard(self, abspath: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the shard of entries valid for the current content of the file.
+
+        The file is fingerprinted without holding the lock, which is only
+        taken to publish the shard.
+        """
+        with self._lock:
+            shard = self._shards.get(abspath)
+        if shard is None:
+            shard = read_json(self._shard_path(abspath))
+        if shard is None or not FileFingerprint.from_list(shard["fingerprint"]).is_current():
+            fingerprint = FileFingerprint.of(abspath)
+            if fingerprint is None:
+                return None
+            shard = {"fingerprint": fingerprint.to_list(), "entries": {}}
+
+        with self._lock:
+            published = self._shards.get(abspath)
+            # keep the entries of a shard another thread published for the same content
+            if published is not None and published["fingerprint"] == shard["fingerprint"]:
+                return published
+            self._shards[abspath] = shard
+            return shard
+
+    @staticmethod
+    def _entry_key(method: str, data: Dict[str, Any]) -> str:
+        return f"{method}:{data.get('line')}:{data.get('character')}"
+
+    def get(self, method: str, data: Dict[str, Any]) -> Tuple[bool, Any]:
+        abspath = data.get("abspath")
+        if not abspath:
+            return False, None
+
+        with self._lock:
+            self._lookups[method] = self._lookups.get(method, 0) + 1
+        shard = self._load_shard(abspath)
+        if shard is None:
+            return False, None
+        key = self._entry_key(method, data)
+        with self._lock:
+            entry = shard["entries"].get(key)
+
+        if entry is not None and all(
+            FileFingerprint.from_list(d).is_current() for d in entry["deps"]
+        ):
+            with self._lock:
+                self._hits[method] = self._hits.get(method, 0) + 1
+            return True, entry["result"]
+
+        with self._lock:
+            self._pending[(abspath, key)] = shard["fingerprint"]
+        return False, None
+
+    def put(self, method: str, data: Dict[str, Any], result: Any):
+        abspath = data.get("abspath")
+        key = self._entry_key(method, data)
+        with self._lock:
+            fingerprint = self._pending.pop((abspath, key), None)
+        # an empty result may come from a language server still indexing
+        if fingerprint is None or not isinstance(result, list) or not result:
+            return
+
+        deps = []
+        try:
+            for dep_path in sorted({loc["abspath"] for loc in result}):
+                dep = FileFingerprint.of(dep_path)
+                if dep is None:
+                    # can't tell later whether the location is still valid
+                    return
+                deps.append(dep.to_list())
+        except (KeyError, TypeError):
+            return
+
+        shard = self._load_shard(abspath)
+        with self._lock:
+            # the file changed during the call, the result may be for its old content
+            if shard is None or shard["fingerprint"] != fingerprint:
+                return
+            if self._shards.get(abspath) is not shard:
+                return
+            shard["entries"][key] = {"result": result, "deps": deps}
+            self._dirty.add(abspath)
+
+    def flush(self):
+        """
+        Write the shards changed since the last flush.
+        """
+        with self._lock:
+            # copies, the shards may get new entries while they are written
+            changed = [
+                (
+                    abspath,
+                    {**self._shards[abspath], "entries": dict(self._shards[abspath]["entries"])},
+                )
+                for abspath in self._dirty
+                if abspath in self._shards
+            ]
+            self._dirty.clear()
+        for abspath, shard in changed:
+            write_json(self._shard_path(abspath), shard)
+
+    def hit_ratios(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Return method -> (hits, lookups)
+        """
+        with self._lock:
+            return {m: (self._hits.get(m, 0), n) for m, n in self._lookups.items()}
+
+    def report(self):
+        """
+        Log hit ratios through the IDE logging channel.
+        """
+        ratios = self.hit_ratios()
+        if not ratios or os.environ.get("DEVCHAT_IDE_SERVICE_URL", "") == "":
+            return
+
+        message = ", ".join(
+            f"{m} {hits}/{lookups} ({hits / lookups:.0%})" for m, (hits, lookups) in ratios.items()
+        )
+        try:
+            get_transport().call(
+                "ide_logging", {"level": "debug", "message": f"Cache hits: {message}"}
+            )
+        except Exception:
+            pass
@@ -0,0 +1,177 @@
+import mmap
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from itertools import accumulate, islice
+from typing import Optional, Tuple, Union
+
+# files from this size on are memory-mapped instead of read
+MMAP_THRESHOLD = 1024 * 1024
+MAX_CACHED_VIEWS = 16
+# bytes scanned at once when indexing line starts
+INDEX_CHUNK_SIZE = 1024 * 1024
+
+
+class FileView:
+    """
+    Read-only view of a text file that returns line and character ranges
+    without splitting the whole file into lines.
+
+    The offsets of line starts are indexed lazily, only as far as the lines
+    requested so far. Large files are memory-mapped, until they change on disk:
+    reading a memory map past the end of a truncated file kills the process
+    with SIGBUS, so a mapped view checks the file's size and mtime before each
+    read and switches to a copy of the new content when they changed.
+    Line and character numbers are 0-based, line breaks are normalized to "\\n",
+    bytes not valid in the encoding are decoded to U+FFFD.
+    """
+
+    def __init__(self, abspath: str, encoding: str = "utf-8"):
+        self.abspath = abspath
+        self.encoding = encoding
+        self._lock = threading.Lock()
+        self._load(map_large=True)
+
+    def _load(self, map_large: bool):
+        st = os.stat(self.abspath)
+        self.stamp: Tuple[int, int] = (st.st_size, st.st_mtime_ns)
+
+        self._map: Optional[mmap.mmap] = None
+        with open(self.abspath, "rb") as f:
+            if map_large and st.st_size >= MMAP_THRESHOLD:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._data: Union[bytes, mmap.mmap] = self._map
+            else:
+                self._data = f.read()
+
+        self._offsets = array("q", [0])  # byte offsets of the line starts indexed so far
+        self._indexed = False  # whether all line starts are indexed
+
+    def _check_map(self):
+        """
+        Switch a mapped view to a copy of the file's content if the file changed.
+        """
+        if self._map is None:
+            return
+        try:
+            st = os.stat(self.abspath)
+        except OSError:
+            # a deleted file stays mapped until the map is released
+            return
+        if (st.st_size, st.st_mtime_ns) == self.stamp:
+            return
+        with self._lock:
+            if self._map is not None:
+                # the old map is not closed, other threads may still be reading it
+                self._load(map_large=False)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def _line_start(self, line: int) -> int:
+        """
+        Return the byte offset where the line starts, the file size past the last line.
+        """
+        offsets = self._offsets
+        if line < len(offsets):
+            return offsets[line]
+
+        with self._lock:
+            offsets, data = self._offsets, self._data
+            while len(offsets) <= line and not self._indexed:
+                pos = offsets[-1]
+                chunk = data[pos : pos + INDEX_CHUNK_SIZE]
+                last = chunk.rfind(b"\n")
+                if last < 0:
+                    # no line break in the rest of the file, or a line longer than a chunk
+                    next_pos = data.find(b"\n", pos + len(chunk))
+                    if next_pos < 0:
+                        self._indexed = True
+                    else:
+                        offsets.append(next_pos + 1)
+                    continue
+                # the lengths of the lines ending in the chunk give their next line starts
+                lengths = map((1).__add__, map(len, chunk[:last].split(b"\n")))
+                offsets.extend(islice(accumulate(lengths, initial=pos), 1, None))
+        return offsets[line] if line < len(offsets) else len(self._data)
+
+    def _decode(self, start: int, end: int) -> str:
+        text = self._data[start:end].decode(self.encoding, errors="replace")
+        return text.replace("\r\n", "\n")
+
+    @property
+    def line_count(self) -> int:
+        """
+        Number of lines, as in content.split("\\n").
+        """
+        self._check_map()
+        self._line_start(len(self._data) + 1)
+        return len(self._offsets)
+
+    def content(self) -> str:
+        self._check_map()
+        return self._decode(0, len(self._data))
+
+    def lines(self, start_line: int, end_line: int) -> str:
+        """
+        Return the lines from start_line to end_line (inclusive) with their line breaks,
+        as "".join(readlines()[start_line : end_line + 1]).
+        """
+        start_line = max(start_line, 0)
+        if end_line < start_line:
+            return ""
+        self._check_map()
+        return self._decode(self._line_start(start_line), self._line_start(end_line + 1))
+
+    def text(
+        self, start_line: int, start_char: int, end_line: int, end_char: Optional[int] = None
+    ) -> str:
+        """
+        Return the text from (start_line, start_char) to (end_line, end_char),
+        end_char excluded. Without end_char, the text ends with the end line,
+        excluding its line break.
+        """
+        start_line = max(start_line, 0)
+        if end_line < start_line:
+            return ""
+
+        self._check_map()
+        last_line = self._decode(self._line_start(end_line), self._line_start(end_line + 1))
+        if last_line.endswith("\n"):
+            last_line = last_line[:-1]
+        if end_char is not None:
+            last_line = last_line[:end_char]
+        return (self.lines(start_line, end_line - 1) + last_line)[start_char:]
+
+
+_views: "OrderedDict[str, FileView]" = OrderedDict()
+_views_lock = threading.Lock()
+
+
+def get_file_view(abspath: str) -> FileView:
+    """
+    Return a view of the current version of the file.
+
+    Views of recently read files are reused while the file's size and mtime are unchanged.
+    """
+    st = os.stat(abspath)
+    stamp = (st.st_size, st.st_mtime_ns)
+
+    with _views_lock:
+        view = _views.get(abspath)
+        if view is not None and view.stamp == stamp:
+            _views.move_to_end(abspath)
+            return view
+
+    # replaced and evicted views are not closed, they may still be in use,
+    # their memory maps are released with them
+    view = FileView(abspath)
+    with _views_lock:
+        _views[abspath] = view
+        _views.move_to_end(abspath)
+        while len(_views) > MAX_CACHED_VIEWS:
+            _views.popitem(last=False)
+    return view
@@ -1,15 +1,19 @@
-from .rpc import rpc_method
+from typing import Optional
+
+from .rpc import RPCBatch, rpc_method
 from .types import LocationWithText
 
 
 class IdeaIDEService:
-    def __init__(self):
+    def __init__(self, batch: Optional[RPCBatch] = None):
         self._result = None
+        # calls are collected in the batch of an IDEService when given
+        self._batch = batch
 
     @rpc_method
     def get_visible_range(self) -> LocationWithText:
-        return LocationWithText.parse_obj(self._result)
+        return LocationWithText.from_raw(self._result)
 
     @rpc_method
     def get_selected_range(self) -> LocationWithText:
-        return LocationWithText.parse_obj(self._result)
+        return LocationWithText.from_raw(self._result)
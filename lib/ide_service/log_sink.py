@@ -0,0 +1,134 @@
+import atexit
+import os
+import threading
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+from .transport import get_transport
+
+DEFAULT_MAX_QUEUE = 1000
+DEFAULT_MAX_BATCH = 100
+# seconds to wait for more messages before sending a batch
+DEFAULT_FLUSH_INTERVAL = 0.05
+# seconds to wait at exit for the queued messages to be sent
+DEFAULT_EXIT_TIMEOUT = 2.0
+
+
+class LogSink:
+    """
+    Sends ide_logging messages from a background thread.
+
+    Messages are queued and the calls are sent in batches through the
+    transport's call_many, so logging does not wait for the IDE. Without a
+    batch endpoint the calls of a batch are sent one after another from the
+    sink thread, which keeps working during the flush at exit.
+    The queue is bounded: when it is full, the oldest message is dropped.
+    Dropped messages and messages that could not be sent are counted in
+    dropped and failed, and logged with the next batch.
+    Queued messages are flushed at exit.
+
+    Set DEVCHAT_IDE_SERVICE_SYNC_LOGGING=1 to send each message synchronously instead.
+    """
+
+    def __init__(
+        self,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+    ):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+
+        self._queue: Deque[Tuple[str, str]] = deque(maxlen=max_queue)
+        self._dropped = 0  # dropped since the last batch sent
+        self._failed = 0  # not sent since the last batch sent
+        self.dropped = 0
+        self.failed = 0
+        self._sending = False
+        self._flushing = 0  # number of flush() calls waiting
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def log(self, level: str, message: str):
+        """
+        Queue the message to be sent.
+        """
+        with self._cond:
+            if len(self._queue) == self._queue.maxlen:
+                self._dropped += 1
+                self.dropped += 1
+            self._queue.append((level, message))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="ide-log-sink", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush, DEFAULT_EXIT_TIMEOUT)
+            self._cond.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until the queued messages are sent, return False on timeout.
+        """
+        with self._cond:
+            self._flushing += 1
+            self._cond.notify_all()
+            try:
+                return self._cond.wait_for(lambda: not self._queue and not self._sending, timeout)
+            finally:
+                self._flushing -= 1
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue)
+                # let more messages arrive, to send them together
+                self._cond.wait_for(
+                    lambda: len(self._queue) >= self.max_batch or self._flushing,
+                    self.flush_interval,
+                )
+                count = min(len(self._queue), self.max_batch)
+                batch = [self._queue.popleft() for _ in range(count)]
+                if self._dropped:
+                    batch.insert(0, ("warn", f"{self._dropped} log messages dropped"))
+                if self._failed:
+                    batch.insert(0, ("warn", f"{self._failed} log messages could not be sent"))
+                self._dropped = self._failed = 0
+                self._sending = True
+
+            failed = 0
+            try:
+                replies = get_transport().call_many(
+                    [("ide_logging", {"level": level, "message": msg}) for level, msg in batch],
+                    pipelined=False,
+                )
+                failed = sum(1 for _, error in replies if error is not None)
+            except Exception:
+                # logging must not break the workflow, the messages are lost
+                failed = len(batch)
+            finally:
+                with self._cond:
+                    self._failed += failed
+                    self.failed += failed
+                    self._sending = False
+                    self._cond.notify_all()
+
+
+_sink: Optional[LogSink] = None
+_sink_lock = threading.Lock()
+
+
+def get_log_sink() -> LogSink:
+    """
+    Return the process-wide log sink, creating it on first use.
+    """
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            _sink = LogSink()
+        return _sink
+
+
+def sync_logging() -> bool:
+    """
+    Whether ide_logging calls are sent synchronously, bypassing the log sink.
+    """
+    return os.environ.get("DEVCHAT_IDE_SERVICE_SYNC_LOGGING", "") in ("1", "true")
@@ -0,0 +1,87 @@
+import json
+import threading
+from typing import Any, Callable, Dict, Tuple
+
+
+def make_key(method: str, data: Dict[str, Any]) -> str:
+    return f"{method}:{json.dumps(data, sort_keys=True, default=str)}"
+
+
+class CachePolicy:
+    """
+    How the result of an RPC method may be reused.
+
+    The base policy never reuses results.
+    """
+
+    # whether results are kept on disk across runs
+    persistent = False
+
+    def get(self, method: str, data: Dict[str, Any]) -> Tuple[bool, Any]:
+        """
+        Return (hit, result) for a call of method with data.
+        """
+        return False, None
+
+    def put(self, method: str, data: Dict[str, Any], result: Any):
+        """
+        Remember the result of a call of method with data.
+        """
+        pass
+
+
+class ProcessCache(CachePolicy):
+    """
+    Reuse results for the lifetime of the process.
+    """
+
+    def __init__(self):
+        self._results: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def get(self, method: str, data: Dict[str, Any]) -> Tuple[bool, Any]:
+        key = make_key(method, data)
+        with self._lock:
+            if key in self._results:
+                return True, self._results[key]
+        return False, None
+
+    def put(self, method: str, data: Dict[str, Any], result: Any):
+        with self._lock:
+            self._results[make_key(method, data)] = result
+
+
+NEVER = CachePolicy()
+
+_policies: Dict[str, CachePolicy] = {}
+
+
+def cache_policy(policy: CachePolicy) -> Callable:
+    """
+    Declare the cache policy of an RPC method's endpoint.
+
+    An endpoint has one policy, shared by the methods calling it.
+    Usage:
+    @cache_policy(ProcessCache())
+    @rpc_method
+    def ide_language(self) -> str:
+        ...
+    """
+
+    def decorator(f):
+        endpoint = getattr(f, "_endpoint", None)
+        if endpoint is None:
+            raise TypeError(f"cache_policy must decorate an RPC method, not {f.__qualname__}")
+        if _policies.get(endpoint, policy) is not policy:
+            raise ValueError(f"{endpoint} already has a cache policy")
+        _policies[endpoint] = policy
+        return f
+
+    return decorator
+
+
+def get_cache_policy(method: str) -> CachePolicy:
+    """
+    Return the declared cache policy of the endpoint method, NEVER if there is none.
+    """
+    return _policies.get(method, NEVER)
@@ -1,9 +1,52 @@
 import os
-from functools import wraps
+from concurrent.futures import Future
+from functools import partial, wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
-import requests
+from .transport import get_transport
 
-BASE_SERVER_URL = os.environ.get("DEVCHAT_IDE_SERVICE_URL", "http://localhost:3000")
+
+class RPCBatch:
+    """
+    Collects rpc_method calls and sends them at once on flush.
+
+    Each collected call gets a Future which is resolved in order of the calls
+    when the batch is flushed.
+    """
+
+    def __init__(self):
+        self._calls: List[Tuple[str, Dict[str, Any], Callable[[Any], Any], Future]] = []
+
+    def add(self, method: str, data: Dict[str, Any], convert: Callable[[Any], Any]) -> Future:
+        future = Future()
+        self._calls.append((method, data, convert, future))
+        return future
+
+    def flush(self):
+        calls, self._calls = self._calls, []
+        if not calls:
+            return
+
+        if os.environ.get("DEVCHAT_IDE_SERVICE_URL", "") == "":
+            # same as unbatched calls, nothing is sent without a service
+            for _, _, _, future in calls:
+                future.set_result(None)
+            return
+
+        results = get_transport().call_many([(method, data) for method, data, _, _ in calls])
+        for (_, _, convert, future), (result, error) in zip(calls, results):
+            if error is not None:
+                future.set_exception(error)
+                continue
+            try:
+                future.set_result(convert(result))
+            except Exception as err:
+                future.set_exception(err)
+
+    def cancel(self):
+        calls, self._calls = self._calls, []
+        for _, _, _, future in calls:
+            future.cancel()
 
 
 def rpc_call(f):
@@ -15,21 +58,11 @@ def rpc_call(f):
 
         try:
             function_name = f.__name__
-            url = f"{BASE_SERVER_URL}/{function_name}"
 
             data = dict(zip(f.__code__.co_varnames, args))
             data.update(kwargs)
-            headers = {"Content-Type": "application/json"}
-
-            response = requests.post(url, json=data, headers=headers)
 
-            if response.status_code != 200:
-                raise Exception(f"Server error: {response.status_code}")
-
-            response_data = response.json()
-            if "error" in response_data:
-                raise Exception(f"Server returned an error: {response_data['error']}")
-            return response_data.get("result", None)
+            return get_transport().call(function_name, data)
         except ConnectionError as err:
             # TODO
             raise err
@@ -37,40 +70,81 @@ def rpc_call(f):
     return wrapper
 
 
-def rpc_method(f):
+def rpc_method(f=None, *, endpoint: Optional[str] = None):
     """
     Decorator for Service methods
+
+    Inside a batch (the instance's _batch is set), the call is collected
+    and a Future of the method's return value is returned instead.
+
+    endpoint: the RPC method to call, the decorated method's name by default.
+    Usage:
+    @rpc_method(endpoint="get_document_symbols")
+    def get_document_symbol_table(self, abspath: str) -> SymbolTable:
+        ...
     """
+    if f is None:
+        return partial(rpc_method, endpoint=endpoint)
 
     @wraps(f)
     def wrapper(self, *args, **kwargs):
-        if os.environ.get("DEVCHAT_IDE_SERVICE_URL", "") == "":
-            # maybe in a test, user don't want to mock services functions
-            return
+        function_name = endpoint or f.__name__
 
-        try:
-            function_name = f.__name__
-            url = f"{BASE_SERVER_URL}/{function_name}"
+        data = dict(zip(f.__code__.co_varnames[1:], args))  # Exclude "self"
+        data.update(kwargs)
 
-            data = dict(zip(f.__code__.co_varnames[1:], args))  # Exclude "self"
-            data.update(kwargs)
-            headers = {"Content-Type": "application/json"}
+        batch = getattr(self, "_batch", None)
+        if batch is not None:
 
-            response = requests.post(url, json=data, headers=headers)
+            def convert(result):
+                self._result = result
+                return f(self, *args, **kwargs)
 
-            if response.status_code != 200:
-                raise Exception(f"Server error: {response.status_code}")
+            return batch.add(function_name, data, convert)
 
-            response_data = response.json()
-            if "error" in response_data:
-                raise Exception(f"Server returned an error: {response_data['error']}")
+        if os.environ.get("DEVCHAT_IDE_SERVICE_URL", "") == "":
+            # maybe in a test, user don't want to mock services functions
+            return
 
+        try:
             # Store the result in the _result attribute of the instance
-            self._result = response_data.get("result", None)
+            self._result = get_transport().call(function_name, data)
             return f(self, *args, **kwargs)
 
         except ConnectionError as err:
             # TODO
             raise err
 
+    wrapper._is_rpc_method = True
+    wrapper._endpoint = endpoint or f.__name__
+    return wrapper
+
+
+def rpc_stream_method(f=None, *, endpoint: Optional[str] = None):
+    """
+    Decorator for Service methods yielding the items of a list result as they arrive
+
+    The decorated method converts one item, stored in the instance's _result.
+    The call is sent when iteration starts. Streams are not collected in batches.
+
+    endpoint: the RPC method to call, the decorated method's name by default.
+    """
+    if f is None:
+        return partial(rpc_stream_method, endpoint=endpoint)
+
+    @wraps(f)
+    def wrapper(self, *args, **kwargs) -> Iterator[Any]:
+        function_name = endpoint or f.__name__
+
+        data = dict(zip(f.__code__.co_varnames[1:], args))  # Exclude "self"
+        data.update(kwargs)
+
+        if os.environ.get("DEVCHAT_IDE_SERVICE_URL", "") == "":
+            # maybe in a test, user don't want to mock services functions
+            return
+
+        for item in get_transport().stream(function_name, data):
+            self._result = item
+            yield f(self, *args, **kwargs)
+
     return wrapper
@@ -1,9 +1,29 @@
-from typing import List
+import os
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
 
+from .file_cache import DocumentSymbolCache, LocationCache
 from .idea_service import IdeaIDEService
-from .rpc import rpc_method
-from .types import Location, LocationWithText, SymbolNode
-from .vscode_service import selected_range, visible_range
+from .log_sink import get_log_sink, sync_logging
+from .memo import ProcessCache, cache_policy
+from .rpc import RPCBatch, rpc_method, rpc_stream_method
+from .symbol_table import SymbolTable
+from .transport import MethodNotSupportedError
+from .types import EditorSnapshot, Location, LocationWithText, SymbolNode
+from .vscode_service import active_text_editor, selected_range, visible_range
+
+# shared by both definition lookups, hit ratios are reported per method
+_location_cache = LocationCache()
+
+
+def _range_or_empty(raw: Optional[Dict[str, Any]], character: int) -> LocationWithText:
+    """
+    The range sent by the IDE, or the empty one of the separate calls when there is none.
+    """
+    if raw:
+        return LocationWithText.from_raw(raw)
+    position = {"line": -1, "character": character}
+    return LocationWithText(abspath="", text="", range={"start": position, "end": position})
 
 
 class IDEService:
@@ -14,11 +34,44 @@ class IDEService:
     client = IDEService()
     res = client.ide_language()
     res = client.ide_logging("info", "some message")
+
+    Batch usage:
+    with client.batch():
+        f1 = client.find_def_locations(abspath, 1, 4)
+        f2 = client.get_document_symbols(abspath)
+    locations, symbols = f1.result(), f2.result()
     """
 
     def __init__(self):
         self._result = None
+        self._batch = None
+
+    @contextmanager
+    def batch(self) -> Iterator["IDEService"]:
+        """
+        Collect the RPC methods called in the block and send them in one request.
 
+        Inside the block, RPC methods return futures instead of results.
+        The futures are resolved in order when the block exits.
+        If the IDE does not support batching, the calls are pipelined individually.
+        """
+        if self._batch is not None:
+            # nested batch, the outer one sends the calls
+            yield self
+            return
+
+        batch = RPCBatch()
+        self._batch = batch
+        try:
+            yield self
+        except BaseException:
+            batch.cancel()
+            raise
+        finally:
+            self._batch = None
+        batch.flush()
+
+    @cache_policy(ProcessCache())
     @rpc_method
     def get_lsp_brige_port(self) -> str:
         """
@@ -44,6 +97,7 @@ class IDEService:
         """
         return self._result
 
+    @cache_policy(ProcessCache())
     @rpc_method
     def ide_language(self) -> str:
         """
@@ -53,14 +107,28 @@ class IDEService:
         """
         return self._result
 
-    @rpc_method
     def ide_logging(self, level: str, message: str) -> bool:
         """
         Logs a message to the IDE.
         level: "info" | "warn" | "error" | "debug"
+
+        The message is queued and sent in the background by the log sink,
+        True is returned once it is queued. Inside a batch, or with
+        DEVCHAT_IDE_SERVICE_SYNC_LOGGING=1, it is sent like other RPC methods.
         """
+        if self._batch is not None or sync_logging():
+            return self._ide_logging(level, message)
+        if os.environ.get("DEVCHAT_IDE_SERVICE_URL", "") == "":
+            return None
+
+        get_log_sink().log(level, message)
+        return True
+
+    @rpc_method(endpoint="ide_logging")
+    def _ide_logging(self, level: str, message: str) -> bool:
         return self._result
 
+    @cache_policy(DocumentSymbolCache())
     @rpc_method
     def get_document_symbols(self, abspath: str) -> List[SymbolNode]:
         """
@@ -73,11 +141,36 @@ class IDEService:
             A list of SymbolNode objects representing the symbols found in the document.
         """
         try:
-            return [SymbolNode.parse_obj(node) for node in self._result]
+            return SymbolTable.from_raw(self._result).nodes()
         except Exception:
             # TODO: logging ide service error
             return []
 
+    @rpc_method(endpoint="get_document_symbols")
+    def get_document_symbol_table(self, abspath: str) -> SymbolTable:
+        """
+        Retrieves the document symbols for a given file as a SymbolTable.
+
+        Same call and cache as get_document_symbols, without building
+        a SymbolNode tree, for indexed lookups by name and line.
+        """
+        try:
+            return SymbolTable.from_raw(self._result)
+        except Exception:
+            # TODO: logging ide service error
+            return SymbolTable.from_raw([])
+
+    @rpc_stream_method(endpoint="get_document_symbols")
+    def iter_document_symbols(self, abspath: str) -> Iterator[SymbolNode]:
+        """
+        Yields the top-level document symbols of a file, with their children,
+        as they arrive. Stop iterating to skip the rest of the response.
+
+        Same call and cache as get_document_symbols.
+        """
+        return SymbolTable.from_raw([self._result]).node(0)
+
+    @cache_policy(_location_cache)
     @rpc_method
     def find_type_def_locations(self, abspath: str, line: int, character: int) -> List[Location]:
         """
@@ -92,19 +185,21 @@ class IDEService:
             A list of Location objects representing the locations of type definitions found.
         """
         try:
-            return [Location.parse_obj(loc) for loc in self._result]
+            return [Location.from_raw(loc) for loc in self._result]
         except Exception:
             # TODO: logging ide service error
             return []
 
+    @cache_policy(_location_cache)
     @rpc_method
     def find_def_locations(self, abspath: str, line: int, character: int) -> List[Location]:
         try:
-            return [Location.parse_obj(loc) for loc in self._result]
+            return [Location.from_raw(loc) for loc in self._result]
         except Exception:
             # TODO: logging ide service error
             return []
 
+    @cache_policy(ProcessCache())
     @rpc_method
     def ide_name(self) -> str:
         """Returns the name of the IDE.
@@ -153,6 +248,66 @@ class IDEService:
             return selected_range()
         return IdeaIDEService().get_selected_range()
 
+    # whether the IDE provides the editor_snapshot endpoint. Shared by all instances for
+    # the life of the process: once the IDE answers that it lacks the endpoint, it isn't
+    # asked again. Other failures don't clear it, the endpoint is tried again next time.
+    _editor_snapshot_supported = True
+
+    @rpc_method(endpoint="editor_snapshot")
+    def _editor_snapshot(self) -> EditorSnapshot:
+        return EditorSnapshot(
+            ide_name=self._result.get("ide_name") or "",
+            language=self._result.get("language") or "",
+            abspath=self._result.get("abspath") or "",
+            selected_range=_range_or_empty(self._result.get("selected_range"), -1),
+            visible_range=_range_or_empty(self._result.get("visible_range"), 0),
+        )
+
+    def editor_snapshot(self) -> EditorSnapshot:
+        """
+        Retrieves the IDE name and language, the active file, and its selected and
+        visible ranges with their text, in one call.
+
+        If the IDE doesn't provide the snapshot endpoint, or the call fails, it is
+        composed from the separate calls, reading the active editor only once.
+        Not available inside a batch.
+        """
+        if IDEService._editor_snapshot_supported:
+            try:
+                snapshot = self._editor_snapshot()
+                if snapshot is not None:
+                    return snapshot
+            except MethodNotSupportedError:
+                IDEService._editor_snapshot_supported = False
+            except Exception:
+                # e.g. an error of the IDE service or a malformed result, the
+                # separate calls may still work
+                pass
+
+        with self.batch():
+            ide_name_future = self.ide_name()
+            language_future = self.ide_language()
+        ide_name, language = ide_name_future.result(), language_future.result()
+
+        if ide_name == "vscode":
+            editor = active_text_editor()
+            selected = selected_range(editor)
+            visible = visible_range(editor)
+        else:
+            with self.batch():
+                idea = IdeaIDEService(self._batch)
+                selected_future = idea.get_selected_range()
+                visible_future = idea.get_visible_range()
+            selected, visible = selected_future.result(), visible_future.result()
+
+        return EditorSnapshot(
+            ide_name=ide_name or "",
+            language=language or "",
+            abspath=selected.abspath if selected else "",
+            selected_range=selected,
+            visible_range=visible,
+        )
+
     @rpc_method
     def get_diagnostics_in_range(self, fileName: str, startLine: int, endLine: int) -> List[str]:
         """
@@ -173,6 +328,7 @@ class IDEService:
         """
         return self._result
 
+    @cache_policy(ProcessCache())
     @rpc_method
     def get_extension_tools_path(self) -> str:
         """
@@ -0,0 +1,157 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .transport import BATCH_ENDPOINT, NDJSON_CONTENT_TYPE, reset_transport
+
+
+class StubIDEServer:
+    """
+    In-process stand-in for the IDE service, to run workflows offline.
+
+    Each handler receives the json params of a call as keyword arguments and
+    returns the result. An exception raised by a handler is sent back as the
+    call's error. Methods without handler answer 404, like an IDE lacking them.
+
+    Usage:
+    handlers = {"ide_name": lambda: "vscode"}
+    with StubIDEServer(handlers):
+        IDEService().ide_name()
+    """
+
+    def __init__(
+        self,
+        handlers: Dict[str, Callable[..., Any]],
+        host: str = "127.0.0.1",
+        port: int = 0,
+        support_batch: bool = True,
+        latency: float = 0.0,
+        support_stream: bool = True,
+    ):
+        """
+        handlers: method name -> handler
+        port: port to listen on, 0 to pick a free one
+        support_batch: whether to accept the batch request envelope
+        latency: seconds to wait before answering each request
+        support_stream: whether to stream list results to clients accepting ndjson
+        """
+        self.handlers = handlers
+        self.support_batch = support_batch
+        self.support_stream = support_stream
+        self.latency = latency
+
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+        self._old_url: Optional[str] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def respond(self, method: str, params: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        """
+        Return the HTTP status and the payload answering a call of method.
+        """
+        if method not in self.handlers:
+            return 404, {"error": f"Unknown method: {method}"}
+        try:
+            return 200, {"result": self.handlers[method](**params)}
+        except Exception as err:
+            return 200, {"error": str(err)}
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                params = json.loads(self.rfile.read(length) or b"{}")
+                method = self.path.strip("/")
+
+                if stub.latency:
+                    time.sleep(stub.latency)
+
+                if method == BATCH_ENDPOINT and stub.support_batch:
+                    replies = [
+                        stub.respond(c["method"], c.get("params", {}))[1] for c in params["calls"]
+                    ]
+                    self._reply(200, {"result": replies})
+                    return
+
+                status, payload = stub.respond(method, params)
+                streamed = (
+                    stub.support_stream
+                    and NDJSON_CONTENT_TYPE in self.headers.get("Accept", "")
+                    and status == 200
+                    and isinstance(payload.get("result"), list)
+                )
+                if streamed:
+                    self._stream(payload["result"])
+                else:
+                    self._reply(status, payload)
+
+            def _reply(self, status: int, payload: Dict[str, Any]):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _stream(self, items: List[Any]):
+                self.send_response(200)
+                self.send_header("Content-Type", NDJSON_CONTENT_TYPE)
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for item in items:
+                        line = json.dumps({"item": item}).encode("utf-8") + b"\n"
+                        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # the client stopped reading
+                    self.close_connection = True
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        """
+        Serve in a background thread and point DEVCHAT_IDE_SERVICE_URL at the stub.
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+        self._old_url = os.environ.get("DEVCHAT_IDE_SERVICE_URL")
+        os.environ["DEVCHAT_IDE_SERVICE_URL"] = self.url
+        reset_transport()
+
+    def stop(self):
+        """
+        Stop serving and restore DEVCHAT_IDE_SERVICE_URL.
+        """
+        self._server.shutdown()
+        self._server.server_close()
+
+        if self._old_url is None:
+            os.environ.pop("DEVCHAT_IDE_SERVICE_URL", None)
+        else:
+            os.environ["DEVCHAT_IDE_SERVICE_URL"] = self._old_url
+        reset_transport()
+
+    def __enter__(self) -> "StubIDEServer":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
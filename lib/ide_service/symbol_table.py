@@ -0,0 +1,180 @@
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .types import Position, Range, SymbolNode
+
+
+class SymbolTable:
+    """
+    Array-backed table of the document symbols of a file.
+
+    Symbols are stored in pre-order as parallel arrays (range, kind id, name id,
+    parent index, depth and subtree size), built straight from the raw json
+    returned by the IDE. Indexes answer the common lookups without walking
+    the tree:
+    - starting_at(line): symbols starting at a line, O(1)
+    - named(name): symbols with a name, O(1)
+
+    SymbolNode views are built on demand for code using the pydantic API.
+    """
+
+    def __init__(self):
+        self.start_line = array("l")
+        self.start_char = array("l")
+        self.end_line = array("l")
+        self.end_char = array("l")
+        self.kind_id = array("l")
+        self.name_id = array("l")
+        self.parent = array("l")  # -1 for top-level symbols
+        self.depth = array("l")
+        self.size = array("l")  # number of symbols in the subtree, itself included
+
+        self._names: List[str] = []
+        self._name_ids: Dict[str, int] = {}
+        self._kinds: List[str] = []
+
+        self._by_name: Dict[int, List[int]] = {}
+        self._by_start_line: Dict[int, List[int]] = {}
+
+        self._views: Dict[int, SymbolNode] = {}
+
+    @classmethod
+    def from_raw(cls, nodes: Optional[List[Dict[str, Any]]]) -> "SymbolTable":
+        """
+        Build the table from the raw json of document symbols.
+        """
+        table = cls()
+        name_ids = table._name_ids
+        kind_ids: Dict[str, int] = {}
+
+        stack = [(n, -1, 0) for n in reversed(nodes or [])]
+        while stack:
+            node, parent, depth = stack.pop()
+            index = len(table.parent)
+
+            name = node["name"]
+            name_id = name_ids.get(name)
+            if name_id is None:
+                name_id = name_ids[name] = len(table._names)
+                table._names.append(name)
+            kind = node["kind"]
+            kind_id = kind_ids.get(kind)
+            if kind_id is None:
+                kind_id = kind_ids[kind] = len(table._kinds)
+                table._kinds.append(kind)
+
+            start, end = node["range"]["start"], node["range"]["end"]
+            table.start_line.append(start["line"])
+            table.start_char.append(start["character"])
+            table.end_line.append(end["line"])
+            table.end_char.append(end["character"])
+            table.kind_id.append(kind_id)
+            table.name_id.append(name_id)
+            table.parent.append(parent)
+            table.depth.append(depth)
+            table.size.append(1)
+
+            table._by_name.setdefault(name_id, []).append(index)
+            table._by_start_line.setdefault(start["line"], []).append(index)
+
+            stack.extend((c, index, depth + 1) for c in reversed(node.get("children") or []))
+
+        # children come after their parent in pre-order
+        for i in range(len(table.parent) - 1, 0, -1):
+            if table.parent[i] >= 0:
+                table.size[table.parent[i]] += table.size[i]
+        return table
+
+    def __len__(self) -> int:
+        return len(self.parent)
+
+    def name(self, index: int) -> str:
+        return self._names[self.name_id[index]]
+
+    def kind(self, index: int) -> str:
+        return self._kinds[self.kind_id[index]]
+
+    def children(self, index: int) -> Iterator[int]:
+        child = index + 1
+        end = index + self.size[index]
+        while child < end:
+            yield child
+            child += self.size[child]
+
+    def roots(self) -> Iterator[int]:
+        index = 0
+        while index < len(self):
+            yield index
+            index += self.size[index]
+
+    def starting_at(self, line: int) -> List[int]:
+        """
+        Return the symbols starting at the line, in pre-order.
+        """
+        return list(self._by_start_line.get(line, []))
+
+    def named(self, name: str) -> List[int]:
+        """
+        Return the symbols with the name, in pre-order.
+        """
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            return []
+        return list(self._by_name[name_id])
+
+    def find(self, name: Optional[str] = None, line: Optional[int] = None) -> List[Tuple[int, int]]:
+        """
+        Find the symbols with the specified name and start line.
+        Symbols nested in a match are not reported.
+        A falsy name or line ("" or 0) matches any symbol, like None.
+
+        return: a list of tuples (symbol index, depth) in pre-order
+        """
+        assert name is not None or line is not None
+
+        if name and line:
+            candidates = [i for i in self.starting_at(line) if self.name(i) == name]
+        elif name:
+            candidates = self.named(name)
+        elif line:
+            candidates = self.starting_at(line)
+        else:
+            candidates = list(self.roots())
+
+        res = []
+        matched = set()
+        for index in candidates:
+            ancestor = self.parent[index]
+            while ancestor >= 0 and ancestor not in matched:
+                ancestor = self.parent[ancestor]
+            if ancestor < 0:
+                matched.add(index)
+                res.append((index, self.depth[index]))
+        return res
+
+    def range(self, index: int) -> Range:
+        return Range.construct(
+            start=Position.construct(line=self.start_line[index], character=self.start_char[index]),
+            end=Position.construct(line=self.end_line[index], character=self.end_char[index]),
+        )
+
+    def node(self, index: int) -> SymbolNode:
+        """
+        Return the SymbolNode view of the symbol, built without validation.
+        """
+        view = self._views.get(index)
+        if view is None:
+            view = SymbolNode.construct(
+                name=self.name(index),
+                kind=self.kind(index),
+                range=self.range(index),
+                children=[self.node(c) for c in self.children(index)],
+            )
+            self._views[index] = view
+        return view
+
+    def nodes(self) -> List[SymbolNode]:
+        """
+        Return the SymbolNode views of the top-level symbols.
+        """
+        return [self.node(i) for i in self.roots()]
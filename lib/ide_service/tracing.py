@@ -0,0 +1,359 @@
+import atexit
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+TRACE_DIR_PATH = [".chat", "workflows", "traces"]
+
+
+@dataclass
+class RPCEvent:
+    method: str
+    start: float  # perf_counter() at start
+    duration: float  # seconds
+    request_size: int  # bytes
+    response_size: int  # bytes
+    status: int  # HTTP status, -1 if no response was received
+    thread_id: int
+
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    """
+    Nearest-rank percentile of ascending values
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class RPCTracer:
+    """
+    Records every RPC round trip and writes them at exit as a Chrome trace-event
+    file (viewable in chrome://tracing or Perfetto) plus a latency summary table.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._epoch = time.perf_counter()
+        self._events: List[RPCEvent] = []
+        self._lock = threading.Lock()
+        atexit.register(self.dump)
+
+    @property
+    def summary_path(self) -> str:
+        return f"{os.path.splitext(self.path)[0]}.summary.txt"
+
+    def record(self, event: RPCEvent):
+        with self._lock:
+            self._events.append(event)
+
+    def events(self) -> List[RPCEvent]:
+        with self._lock:
+            return list(self._events)
+
+    def trace_events(self) -> List[Dict]:
+        pid = os.getpid()
+        return [
+            {
+                "name": e.method,
+                "cat": "rpc",
+                "ph": "X",
+                "ts": (e.start - self._epoch) * 1e6,
+                "dur": e.duration * 1e6,
+                "pid": pid,
+                "tid": e.thread_id,
+                "args": {
+                    "request_size": e.request_size,
+                    "response_size": e.response_size,
+                    "status": e.status,
+                },
+            }
+            for e in self.events()
+        ]
+
+    def summary(self) -> str:
+        """
+        Return a table of call count and p50/p95/max latency (ms) per method.
+        """
+        durations: Dict[str, List[float]] = {}
+        sizes: Dict[str, int] = {}
+        for e in self.events():
+            durations.setdefault(e.method, []).append(e.duration * 1000)
+            sizes[e.method] = sizes.get(e.method, 0) + e.response_size
+
+        header = (
+            f"{'method':<32} {'calls':>6} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'resp KB':>9}"
+        )
+        lines = [header, "-" * len(header)]
+        by_total = sorted(durations.items(), key=lambda kv: sum(kv[1]), reverse=True)
+        for method, values in by_total:
+            values.sort()
+            lines.append(
+                f"{method:<32} {len(values):>6} {_percentile(values, 50):>9.1f} "
+                f"{_percentile(values, 95):>9.1f} {values[-1]:>9.1f} {sizes[method] / 1024:>9.1f}"
+            )
+        return "\n".join(lines)
+
+    def dump(self):
+        """
+        Write the trace-event file and the summary table.
+        """
+        if not self.events():
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump({"traceEvents": self.trace_events(), "displayTimeUnit": "ms"}, f)
+            with open(self.summary_path, "w", encoding="utf-8") as f:
+                f.write(self.summary() + "\n")
+        except OSError:
+            pass
+
+
+_tracer: Optional[RPCTracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Optional[RPCTracer]:
+    """
+    Return the process-wide tracer, None unless tracing is enabled.
+
+    Tracing is enabled by DEVCHAT_IDE_SERVICE_TRACE, set either to the path of
+    the trace file or to 1 for a file under .chat/workflows/traces.
+    """
+    global _tracer
+    value = os.environ.get("DEVCHAT_IDE_SERVICE_TRACE", "")
+    if value in ("", "0", "false"):
+        return None
+
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                path = value
+                if value in ("1", "true"):
+                    name = f"ide_rpc_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}.json"
+                    path = os.path.join(os.getcwd(), *TRACE_DIR_PATH, name)
+                _tracer = RPCTracer(path)
+    return _tracer
+
+
+@dataclass
+class Span:
+    """
+    A timed operation of a workflow, with the operations run inside it as children
+    """
+
+    name: str
+    category: str  # "step", "rpc", "llm", "git"...
+    start: float  # perf_counter() at start
+    duration: float = 0.0  # seconds
+    thread_id: int = 0
+    children: List["Span"] = field(default_factory=list)
+
+    @property
+    def self_time(self) -> float:
+        """
+        Time not spent in children, children run in other threads may overlap
+        """
+        return max(0.0, self.duration - sum(c.duration for c in self.children))
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def _spans_enabled() -> bool:
+    return get_profiler() is not None or profile_summary_enabled()
+
+
+def profile_summary_enabled() -> bool:
+    """
+    Whether Step prints the summary of its spans, set by DEVCHAT_WORKFLOW_PROFILE_SUMMARY=1
+    """
+    return os.environ.get("DEVCHAT_WORKFLOW_PROFILE_SUMMARY", "") in ("1", "true")
+
+
+@contextmanager
+def span(name: str, category: str = "span") -> Iterator[Optional[Span]]:
+    """
+    Time the block as a child of the current span.
+
+    Outside any span, the block starts a new tree, only recorded when profiling
+    is enabled (None is yielded otherwise).
+    """
+    parent = _current_span.get()
+    if parent is None and not _spans_enabled():
+        yield None
+        return
+
+    current = Span(name, category, time.perf_counter(), thread_id=threading.get_ident())
+    if parent is not None:
+        parent.children.append(current)
+    token = _current_span.set(current)
+    try:
+        yield current
+    finally:
+        current.duration = time.perf_counter() - current.start
+        _current_span.reset(token)
+        profiler = get_profiler()
+        if parent is None and profiler is not None:
+            profiler.add(current)
+
+
+def record_span(name: str, category: str, start: float, duration: float):
+    """
+    Add a finished operation as a child of the current span, if any.
+    """
+    parent = _current_span.get()
+    if parent is not None:
+        parent.children.append(
+            Span(name, category, start, duration, thread_id=threading.get_ident())
+        )
+
+
+def _merged_children(spans: List[Span]) -> List[Tuple[str, int, float, List[Span]]]:
+    """
+    Merge spans of the same name: (name, count, total duration, their children)
+    """
+    merged: Dict[str, Tuple[str, int, float, List[Span]]] = {}
+    for s in spans:
+        name, count, duration, children = merged.get(s.name, (s.name, 0, 0.0, []))
+        merged[s.name] = (name, count + 1, duration + s.duration, children + s.children)
+    return sorted(merged.values(), key=lambda m: m[2], reverse=True)
+
+
+def summarize_span(root: Span, min_fraction: float = 0.01, max_depth: int = 4) -> str:
+    """
+    Return the span tree as an indented table, siblings of the same name merged,
+    the spans under min_fraction of the root and below max_depth left out.
+    """
+    lines = [f"{root.name}  {root.duration * 1000:.0f} ms"]
+    threshold = root.duration * min_fraction
+
+    def walk(spans: List[Span], depth: int):
+        hidden = 0
+        for name, count, duration, children in _merged_children(spans):
+            if duration < threshold:
+                hidden += count
+                continue
+            calls = f" x{count}" if count > 1 else ""
+            share = duration / root.duration if root.duration else 0.0
+            lines.append(f"{'  ' * depth}{name}{calls}  {duration * 1000:.0f} ms ({share:.0%})")
+            if depth < max_depth:
+                walk(children, depth + 1)
+        if hidden:
+            lines.append(f"{'  ' * depth}... {hidden} shorter")
+
+    walk(root.children, 1)
+    return "\n".join(lines)
+
+
+class WorkflowProfiler:
+    """
+    Collects the span trees of a workflow and writes them at exit as:
+    - collapsed stacks ("step;child;leaf microseconds" lines), for flamegraph.pl or speedscope
+    - a Chrome trace-event file, viewable in chrome://tracing or Perfetto
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._epoch = time.perf_counter()
+        self._roots: List[Span] = []
+        self._lock = threading.Lock()
+        atexit.register(self.dump)
+
+    @property
+    def folded_path(self) -> str:
+        return f"{os.path.splitext(self.path)[0]}.folded"
+
+    def add(self, root: Span):
+        with self._lock:
+            self._roots.append(root)
+
+    def roots(self) -> List[Span]:
+        with self._lock:
+            return list(self._roots)
+
+    def folded(self) -> str:
+        """
+        Return the collapsed stacks, self time in microseconds per stack.
+        """
+        totals: Dict[str, int] = {}
+        stack = [(r, r.name.replace(";", ",")) for r in self.roots()]
+        while stack:
+            s, path = stack.pop()
+            totals[path] = totals.get(path, 0) + round(s.self_time * 1e6)
+            stack.extend((c, f"{path};{c.name.replace(';', ',')}") for c in s.children)
+        return "\n".join(f"{path} {us}" for path, us in sorted(totals.items()) if us > 0)
+
+    def trace_events(self) -> List[Dict]:
+        pid = os.getpid()
+        events = []
+        stack = self.roots()
+        while stack:
+            s = stack.pop()
+            events.append(
+                {
+                    "name": s.name,
+                    "cat": s.category,
+                    "ph": "X",
+                    "ts": (s.start - self._epoch) * 1e6,
+                    "dur": s.duration * 1e6,
+                    "pid": pid,
+                    "tid": s.thread_id,
+                }
+            )
+            stack.extend(s.children)
+        return events
+
+    def dump(self):
+        """
+        Write the collapsed stacks and the trace-event file.
+        """
+        if not self.roots():
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump({"traceEvents": self.trace_events(), "displayTimeUnit": "ms"}, f)
+            with open(self.folded_path, "w", encoding="utf-8") as f:
+                f.write(self.folded() + "\n")
+        except OSError:
+            pass
+
+
+_profiler: Optional[WorkflowProfiler] = None
+_profiler_lock = threading.Lock()
+
+
+def get_profiler() -> Optional[WorkflowProfiler]:
+    """
+    Return the process-wide workflow profiler, None unless profiling is enabled.
+
+    Profiling is enabled by DEVCHAT_WORKFLOW_PROFILE, set either to the path of
+    the trace file or to 1 for a file under .chat/workflows/traces.
+    """
+    global _profiler
+    value = os.environ.get("DEVCHAT_WORKFLOW_PROFILE", "")
+    if value in ("", "0", "false"):
+        return None
+
+    if _profiler is None:
+        with _profiler_lock:
+            if _profiler is None:
+                path = value
+                if value in ("1", "true"):
+                    name = f"workflow_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}.json"
+                    path = os.path.join(os.getcwd(), *TRACE_DIR_PATH, name)
+                _profiler = WorkflowProfiler(path)
+    return _profiler
@@ -0,0 +1,463 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .cassette import CassetteRecorder, cassette_active, get_recorder, start_replay_from_env
+from .memo import NEVER, CachePolicy, get_cache_policy
+from .tracing import RPCEvent, get_tracer, record_span
+
+DEFAULT_SERVER_URL = "http://localhost:3000"
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_POOL_SIZE = 10
+
+# Endpoint accepting a list of calls in one request envelope:
+# request:  {"calls": [{"method": "ide_name", "params": {}}, ...]}
+# response: {"result": [{"result": "vscode"} | {"error": "..."}, ...]}
+BATCH_ENDPOINT = "batch"
+
+# Streamed results, for methods returning a list, requested with "Accept: application/x-ndjson".
+# The response has one json object per line, {"item": ...} for each item of the list
+# and {"error": "..."} if the call fails midway. A server answering with a plain json
+# response instead is handled as well.
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
+# (result, error) of a call made through RPCTransport.call_many
+RPCResult = Tuple[Any, Optional[Exception]]
+
+
+class RPCError(Exception):
+    """
+    Error reported by the IDE service
+    """
+
+
+class MethodNotSupportedError(RPCError):
+    """
+    The IDE service does not provide the requested endpoint
+    """
+
+
+def _env_float(name: str, default: Optional[float]) -> Optional[float]:
+    value = os.environ.get(name, "")
+    if value == "":
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        return default
+
+
+@dataclass
+class MethodStats:
+    """
+    Latency counters of a single RPC method
+    """
+
+    count: int = 0
+    errors: int = 0
+    # calls answered from cache, without a round trip
+    cache_hits: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+
+    @property
+    def avg_time(self) -> float:
+        return self.total_time / self.count if self.count else 0.0
+
+    def record(self, duration: float, ok: bool):
+        self.count += 1
+        self.total_time += duration
+        self.max_time = max(self.max_time, duration)
+        if not ok:
+            self.errors += 1
+
+
+class RPCTransport:
+    """
+    Keep-alive HTTP transport to the IDE service.
+
+    All RPCs of a process share one pooled session, so consecutive calls reuse
+    the same TCP connection instead of opening a new one per call.
+
+    Configuration (environment variables):
+    - DEVCHAT_IDE_SERVICE_URL: base url of the IDE service
+    - DEVCHAT_IDE_SERVICE_CONNECT_TIMEOUT: connect timeout in seconds, default 5
+    - DEVCHAT_IDE_SERVICE_READ_TIMEOUT: read timeout in seconds, default no limit
+    - DEVCHAT_IDE_SERVICE_POOL_SIZE: max pooled connections, default 10
+    - DEVCHAT_IDE_SERVICE_NO_CACHE: set to 1 to disable the result caches
+    - DEVCHAT_IDE_SERVICE_TRACE: trace file path (or 1) to record every RPC, see tracing.py
+    - DEVCHAT_IDE_SERVICE_RECORD / DEVCHAT_IDE_SERVICE_REPLAY: see cassette.py
+    - DEVCHAT_IDE_SERVICE_SYNC_LOGGING: set to 1 to send ide_logging synchronously, see log_sink.py
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        connect_timeout: Optional[float] = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: Optional[float] = None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        use_cache: bool = True,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout: Tuple[Optional[float], Optional[float]] = (connect_timeout, read_timeout)
+        self.pool_size = pool_size
+        self.use_cache = use_cache
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._session.headers.update({"Content-Type": "application/json"})
+
+        self._stats: Dict[str, MethodStats] = {}
+        self._stats_lock = threading.Lock()
+
+        # None until the first batch tells whether the server supports envelopes
+        self._batch_supported: Optional[bool] = None
+
+    @classmethod
+    def from_env(cls) -> "RPCTransport":
+        pool_size = _env_float("DEVCHAT_IDE_SERVICE_POOL_SIZE", DEFAULT_POOL_SIZE)
+        return cls(
+            base_url=os.environ.get("DEVCHAT_IDE_SERVICE_URL", "") or DEFAULT_SERVER_URL,
+            connect_timeout=_env_float(
+                "DEVCHAT_IDE_SERVICE_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT
+            ),
+            read_timeout=_env_float("DEVCHAT_IDE_SERVICE_READ_TIMEOUT", None),
+            pool_size=max(1, int(pool_size)),
+            use_cache=os.environ.get("DEVCHAT_IDE_SERVICE_NO_CACHE", "") not in ("1", "true"),
+        )
+
+    def call(self, method: str, data: Dict[str, Any]) -> Any:
+        """
+        Call the RPC method with data as json payload and return its result.
+
+        Results are reused according to the method's declared cache policy.
+        """
+        policy = self._cache_policy(method)
+        hit, result = policy.get(method, data)
+        if hit:
+            self._record_hit(method)
+            return result
+
+        result = self._post(method, data)
+        policy.put(method, data, result)
+        return result
+
+    def _post(self, method: str, data: Dict[str, Any]) -> Any:
+        url = f"{self.base_url}/{method}"
+        body = json.dumps(data).encode("utf-8")
+        ok = False
+        status, response_size = -1, 0
+        response_data = None
+        start = time.perf_counter()
+        try:
+            response = self._session.post(url, data=body, timeout=self.timeout)
+            status, response_size = response.status_code, len(response.content)
+            self._check_status(response)
+
+            response_data = response.json()
+            if "error" in response_data:
+                raise RPCError(f"Server returned an error: {response_data['error']}")
+
+            ok = True
+            return response_data.get("result", None)
+        finally:
+            self._observe(method, data, start, len(body), status, response_size, response_data, ok)
+
+    @staticmethod
+    def _check_status(response: requests.Response):
+        if response.status_code == 404:
+            raise MethodNotSupportedError(f"Server error: {response.status_code}")
+        if response.status_code != 200:
+            raise RPCError(f"Server error: {response.status_code}")
+
+    def _observe(
+        self,
+        method: str,
+        data: Dict[str, Any],
+        start: float,
+        request_size: int,
+        status: int,
+        response_size: int,
+        response_data: Optional[Dict[str, Any]],
+        ok: bool,
+        replayable: bool = True,
+    ):
+        """
+        Update the stats, trace and cassette with a finished round trip.
+        replayable: False for a response not read to the end, which isn't recorded
+        """
+        duration = time.perf_counter() - start
+        self._record(method, duration, ok)
+        record_span(method, "rpc", start, duration)
+
+        tracer = get_tracer()
+        if tracer is not None:
+            event = RPCEvent(
+                method=method,
+                start=start,
+                duration=duration,
+                request_size=request_size,
+                response_size=response_size,
+                status=status,
+                thread_id=threading.get_ident(),
+            )
+            tracer.record(event)
+
+        recorder = get_recorder()
+        if recorder is not None and status != -1 and replayable:
+            self._record_interaction(recorder, method, data, status, response_data, duration)
+
+    @staticmethod
+    def _record_interaction(
+        recorder: CassetteRecorder,
+        method: str,
+        data: Dict[str, Any],
+        status: int,
+        response_data: Optional[Dict[str, Any]],
+        duration: float,
+    ):
+        if (
+            method == BATCH_ENDPOINT
+            and status == 200
+            and response_data
+            and "result" in response_data
+        ):
+            # record the calls of an envelope one by one, so that a replay can serve
+            # them batched or not
+            calls = data["calls"]
+            for call, reply in zip(calls, response_data["result"]):
+                recorder.record(call["method"], call["params"], 200, reply, duration / len(calls))
+            return
+        recorder.record(method, data, status, response_data or {}, duration)
+
+    def stream(self, method: str, data: Dict[str, Any]) -> Iterator[Any]:
+        """
+        Call an RPC method returning a list and yield its items as they arrive.
+
+        The caller may stop iterating early, the rest of the response is then
+        not read. Results are reused according to the method's cache policy,
+        and only a fully consumed stream is cached.
+        """
+        policy = self._cache_policy(method)
+        hit, result = policy.get(method, data)
+        if hit:
+            self._record_hit(method)
+            yield from result or []
+            return
+
+        # keep the items only if they are to be cached
+        items: Optional[List[Any]] = None if policy is NEVER else []
+        for item in self._post_stream(method, data):
+            if items is not None:
+                items.append(item)
+            yield item
+        if items is not None:
+            policy.put(method, data, items)
+
+    def _post_stream(self, method: str, data: Dict[str, Any]) -> Iterator[Any]:
+        url = f"{self.base_url}/{method}"
+        body = json.dumps(data).encode("utf-8")
+        ok = True  # stopping early isn't an error
+        complete = False
+        status, response_size = -1, 0
+        response_data = None
+        start = time.perf_counter()
+        # items are kept for the cassette, which only gets fully consumed streams
+        received: Optional[List[Any]] = [] if get_recorder() is not None else None
+        try:
+            with self._session.post(
+                url,
+                data=body,
+                timeout=self.timeout,
+                headers={"Accept": NDJSON_CONTENT_TYPE},
+                stream=True,
+            ) as response:
+                status = response.status_code
+                self._check_status(response)
+
+                if not response.headers.get("Content-Type", "").startswith(NDJSON_CONTENT_TYPE):
+                    # the server doesn't stream this method
+                    response_size = len(response.content)
+                    response_data = response.json()
+                    if "error" in response_data:
+                        raise RPCError(f"Server returned an error: {response_data['error']}")
+                    complete = True
+                    yield from response_data.get("result", None) or []
+                    return
+
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    response_size += len(line) + 1
+                    message = json.loads(line)
+                    if "error" in message:
+                        response_data = message
+                        raise RPCError(f"Server returned an error: {message['error']}")
+                    if received is not None:
+                        received.append(message["item"])
+                    yield message["item"]
+                complete = True
+                response_data = {"result": received}
+        except Exception:
+            ok = False
+            raise
+        finally:
+            self._observe(
+                method,
+                data,
+                start,
+                len(body),
+                status,
+                response_size,
+                response_data,
+                ok,
+                replayable=complete or not ok,
+            )
+
+    def call_many(
+        self, calls: List[Tuple[str, Dict[str, Any]]], pipelined: bool = True
+    ) -> List[RPCResult]:
+        """
+        Call several RPC methods and return (result, error) pairs in the order of calls.
+
+        The calls are sent in one request envelope. If the server does not
+        support envelopes, they are pipelined as individual requests over
+        the pooled connections instead, or sent one after another when
+        pipelined is False or new threads can't be started (at interpreter exit).
+        """
+        results: List[RPCResult] = [(None, None)] * len(calls)
+        pending: List[int] = []
+        for i, (method, data) in enumerate(calls):
+            hit, result = self._cache_policy(method).get(method, data)
+            if hit:
+                self._record_hit(method)
+                results[i] = (result, None)
+            else:
+                pending.append(i)
+
+        replies = self._post_many([calls[i] for i in pending], pipelined)
+        for i, (result, error) in zip(pending, replies):
+            results[i] = (result, error)
+            if error is None:
+                method, data = calls[i]
+                self._cache_policy(method).put(method, data, result)
+        return results
+
+    def _post_many(
+        self, calls: List[Tuple[str, Dict[str, Any]]], pipelined: bool = True
+    ) -> List[RPCResult]:
+        if not calls:
+            return []
+
+        if self._batch_supported is not False:
+            try:
+                envelope = {"calls": [{"method": m, "params": d} for m, d in calls]}
+                replies = self._post(BATCH_ENDPOINT, envelope)
+                self._batch_supported = True
+                return [
+                    (None, RPCError(f"Server returned an error: {r['error']}"))
+                    if "error" in r
+                    else (r.get("result", None), None)
+                    for r in replies
+                ]
+            except MethodNotSupportedError:
+                self._batch_supported = False
+
+        def _call_one(call: Tuple[str, Dict[str, Any]]) -> RPCResult:
+            try:
+                return self._post(*call), None
+            except Exception as err:
+                return None, err
+
+        if len(calls) == 1 or not pipelined:
+            return [_call_one(call) for call in calls]
+        futures = []
+        try:
+            with ThreadPoolExecutor(max_workers=min(self.pool_size, len(calls))) as executor:
+                for call in calls:
+                    # in a copy of the context, to be traced under the current span
+                    context = contextvars.copy_context()
+                    futures.append(executor.submit(context.run, _call_one, call))
+        except RuntimeError:
+            # cannot schedule new futures after interpreter shutdown, e.g. in atexit
+            pass
+        results = [future.result() for future in futures]
+        return results + [_call_one(call) for call in calls[len(futures) :]]
+
+    def _cache_policy(self, method: str) -> CachePolicy:
+        if not self.use_cache:
+            return NEVER
+        policy = get_cache_policy(method)
+        if policy.persistent and cassette_active():
+            return NEVER
+        return policy
+
+    def _method_stats(self, method: str) -> MethodStats:
+        stats = self._stats.get(method)
+        if stats is None:
+            stats = self._stats[method] = MethodStats()
+        return stats
+
+    def _record(self, method: str, duration: float, ok: bool):
+        with self._stats_lock:
+            self._method_stats(method).record(duration, ok)
+
+    def _record_hit(self, method: str):
+        with self._stats_lock:
+            self._method_stats(method).cache_hits += 1
+
+    @property
+    def saved_round_trips(self) -> int:
+        """
+        Number of calls answered from cache instead of the IDE service.
+        """
+        with self._stats_lock:
+            return sum(s.cache_hits for s in self._stats.values())
+
+    def stats(self) -> Dict[str, MethodStats]:
+        """
+        Return a snapshot of the latency counters, keyed by method name.
+        """
+        with self._stats_lock:
+            return {k: MethodStats(**vars(v)) for k, v in self._stats.items()}
+
+    def close(self):
+        self._session.close()
+
+
+_transport: Optional[RPCTransport] = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> RPCTransport:
+    """
+    Return the process-wide transport, creating it on first use.
+    """
+    global _transport
+    if _transport is None:
+        start_replay_from_env()
+        with _transport_lock:
+            if _transport is None:
+                _transport = RPCTransport.from_env()
+    return _transport
+
+
+def reset_transport():
+    """
+    Drop the process-wide transport, the next get_transport() re-reads the environment.
+    """
+    global _transport
+    with _transport_lock:
+        if _transport is not None:
+            _transport.close()
+        _transport = None
@@ -1,4 +1,5 @@
-from typing import List
+import sys
+from typing import Any, Dict, List, Optional, Tuple
 
 from pydantic import BaseModel
 
@@ -8,40 +9,111 @@ __all__ = [
     "Location",
     "SymbolNode",
     "LocationWithText",
+    "EditorSnapshot",
 ]
 
 
-class Position(BaseModel):
+def _trusted(cls, values: Dict[str, Any]):
+    """
+    Create a model from values already of the field types, skipping validation.
+    """
+    return cls.construct(**values)
+
+
+class _Value(BaseModel):
+    """
+    Immutable value type, hashed and compared by the tuple of its fields.
+    """
+
+    class Config:
+        allow_mutation = False
+
+    def _key(self) -> Tuple[Any, ...]:
+        return tuple(getattr(self, name) for name in self.__fields__)
+
+    def __eq__(self, other):
+        if other.__class__ is self.__class__:
+            return self._key() == other._key()
+        return NotImplemented
+
+    def __ne__(self, other):
+        if other.__class__ is self.__class__:
+            return self._key() != other._key()
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self._key())
+
+
+class Position(_Value):
     line: int  # 0-based
     character: int  # 0-based
 
     def __repr__(self):
         return f"Ln{self.line}:Col{self.character}"
 
-    def __hash__(self):
-        return hash(self.__repr__())
+    def _key(self) -> Tuple[int, int]:
+        return self.line, self.character
+
+    @classmethod
+    def from_raw(cls, data: Dict[str, Any]) -> "Position":
+        """
+        Build from json trusted from the IDE, without validation.
+        """
+        return _trusted(cls, {"line": data["line"], "character": data["character"]})
 
 
-class Range(BaseModel):
+class Range(_Value):
     start: Position
     end: Position
 
     def __repr__(self):
         return f"{self.start} - {self.end}"
 
-    def __hash__(self):
-        return hash(self.__repr__())
+    def _key(self) -> Tuple[int, int, int, int]:
+        start, end = self.start, self.end
+        return start.line, start.character, end.line, end.character
 
+    @classmethod
+    def from_raw(cls, data: Dict[str, Any]) -> "Range":
+        """
+        Build from json trusted from the IDE, without validation.
+        """
+        return _trusted(
+            cls,
+            {"start": Position.from_raw(data["start"]), "end": Position.from_raw(data["end"])},
+        )
 
-class Location(BaseModel):
+
+class Location(_Value):
     abspath: str
     range: Range
 
     def __repr__(self):
         return f"{self.abspath}::{self.range}"
 
-    def __hash__(self):
-        return hash(self.__repr__())
+    def _key(self) -> Tuple[Any, ...]:
+        return (self.abspath,) + self.range._key()
+
+    @classmethod
+    def from_raw(
+        cls, data: Dict[str, Any], interned: Optional[Dict[Tuple[Any, ...], "Location"]] = None
+    ) -> "Location":
+        """
+        Build from json trusted from the IDE, without validation.
+
+        interned: a dict owned by the caller to intern locations in, equal locations
+        then share one instance and path strings are shared too.
+        """
+        if interned is None:
+            return _trusted(
+                cls, {"abspath": data["abspath"], "range": Range.from_raw(data["range"])}
+            )
+
+        location = _trusted(
+            cls, {"abspath": sys.intern(data["abspath"]), "range": Range.from_raw(data["range"])}
+        )
+        return interned.setdefault(location._key(), location)
 
 
 class SymbolNode(BaseModel):
@@ -51,7 +123,7 @@ class SymbolNode(BaseModel):
     children: List["SymbolNode"]
 
 
-class LocationWithText(BaseModel):
+class LocationWithText(_Value):
     abspath: str
     range: Range
     text: str
@@ -59,5 +131,36 @@ class LocationWithText(BaseModel):
     def __repr__(self):
         return f"{self.abspath}::{self.range}::{self.text}"
 
+    def _key(self) -> Tuple[Any, ...]:
+        return (self.abspath,) + self.range._key() + (self.text,)
+
     def __hash__(self):
-        return hash(self.__repr__())
+        # the text is compared on equality but not hashed, it can be a whole file
+        return hash((self.abspath,) + self.range._key())
+
+    @classmethod
+    def from_raw(cls, data: Dict[str, Any]) -> "LocationWithText":
+        """
+        Build from json trusted from the IDE, without validation.
+        """
+        return _trusted(
+            cls,
+            {
+                "abspath": data["abspath"],
+                "range": Range.from_raw(data["range"]),
+                "text": data["text"],
+            },
+        )
+
+
+class EditorSnapshot(BaseModel):
+    """
+    State of the active editor, as needed by selection-based workflows
+    """
+
+    ide_name: str
+    language: str  # language of the IDE, e.g. "en" or "zh"
+    abspath: str  # file of the active editor, empty if there is none
+    # None without an IDE service
+    selected_range: Optional[LocationWithText]
+    visible_range: Optional[LocationWithText]
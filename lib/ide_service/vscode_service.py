@@ -1,5 +1,6 @@
 import os
 
+from .file_view import get_file_view
 from .rpc import rpc_call
 from .types import LocationWithText
 
@@ -67,6 +68,10 @@ def workspace_symbols(query: str):
     return run_code(code=code)
 
 
+# default of the active_document arguments, to fetch the active text editor
+_FETCH_EDITOR = object()
+
+
 def active_text_editor():
     code = "return vscode.window.activeTextEditor;"
     return run_code(code=code)
@@ -81,8 +86,12 @@ def open_folder(folder: str):
     run_code(code=code)
 
 
-def visible_lines():
-    active_document = active_text_editor()
+def visible_lines(active_document=_FETCH_EDITOR):
+    """
+    active_document: the active text editor if already retrieved, None if there is none
+    """
+    if active_document is _FETCH_EDITOR:
+        active_document = active_text_editor()
     fail_result = {
         "filePath": "",
         "visibleText": "",
@@ -99,20 +108,18 @@ def visible_lines():
     end_line = active_document["visibleRanges"][0][1]["line"]
 
     # read file lines from start_line to end_line
-    with open(file_path, "r", encoding="utf-8") as file:
-        _lines = file.readlines()
-        _visible_lines = _lines[start_line : end_line + 1]
+    visible_text = get_file_view(file_path).lines(start_line, end_line)
 
     # continue with the rest of the function
     return {
         "filePath": file_path,
-        "visibleText": "".join(_visible_lines),
+        "visibleText": visible_text,
         "visibleRange": [start_line, end_line],
     }
 
 
-def visible_range() -> LocationWithText:
-    visible_range_text = visible_lines()
+def visible_range(active_document=_FETCH_EDITOR) -> LocationWithText:
+    visible_range_text = visible_lines(active_document)
     return LocationWithText(
         text=visible_range_text["visibleText"],
         abspath=visible_range_text["filePath"],
@@ -129,8 +136,12 @@ def visible_range() -> LocationWithText:
     )
 
 
-def selected_lines():
-    active_document = active_text_editor()
+def selected_lines(active_document=_FETCH_EDITOR):
+    """
+    active_document: the active text editor if already retrieved, None if there is none
+    """
+    if active_document is _FETCH_EDITOR:
+        active_document = active_text_editor()
     fail_result = {
         "filePath": "",
         "selectedText": "",
@@ -149,20 +160,18 @@ def selected_lines():
     end_col = active_document["selection"]["end"]["character"]
 
     # read file lines from start_line to end_line
-    with open(file_path, "r", encoding="utf-8") as file:
-        _lines = file.readlines()
-        _selected_lines = _lines[start_line : end_line + 1]
+    selected_text = get_file_view(file_path).lines(start_line, end_line)
 
     # continue with the rest of the function
     return {
         "filePath": file_path,
-        "selectedText": "".join(_selected_lines),
+        "selectedText": selected_text,
         "selectedRange": [start_line, start_col, end_line, end_col],
     }
 
 
-def selected_range() -> LocationWithText:
-    selected_range_text = selected_lines()
+def selected_range(active_document=_FETCH_EDITOR) -> LocationWithText:
+    selected_range_text = selected_lines(active_document)
     return LocationWithText(
         text=selected_range_text["selectedText"],
         abspath=selected_range_text["filePath"],
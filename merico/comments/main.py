@@ -5,7 +5,8 @@ import sys
 from devchat.llm import chat
 from devchat.memory import FixSizeChatMemory
 
-from lib.ide_service import IDEService
+from lib.chatmark import coalesced_stdout
+from lib.ide_service import EditorSnapshot, IDEService
 
 PROMPT = """
 file: {file_path}
@@ -194,9 +195,9 @@ file: t2.ts
 ]
 
 
-def get_selected_code():
+def get_selected_code(snapshot: EditorSnapshot):
     """Retrieves the selected lines of code from the user's selection."""
-    selected_data = IDEService().get_selected_range().dict()
+    selected_data = snapshot.selected_range.dict()
     if selected_data["range"]["start"] == selected_data["range"]["end"]:
         readme_path = os.path.join(os.path.dirname(__file__), "README.md")
         if os.path.exists(readme_path):
@@ -254,11 +255,12 @@ def remove_unnecessary_escapes(code_a, code_b):
 
 
 def main():
-    selected_text = get_selected_code()
+    selected_text = get_selected_code(IDEService().editor_snapshot())
     file_path = selected_text.get("abspath", "")
     code_text = selected_text.get("text", "")
 
-    response = add_comments(selected_text=code_text, file_path=file_path)
+    with coalesced_stdout():
+        response = add_comments(selected_text=code_text, file_path=file_path)
     if not response:
         sys.exit(1)
     new_code = extract_markdown_block(response)
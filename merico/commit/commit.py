@@ -3,11 +3,23 @@ import os
 import re
 import subprocess
 import sys
+import threading
+import time
+from functools import partial
 
 # from llm_api import chat_completion_stream  # noqa: E402
 from devchat.llm import chat_completion_stream
 
-from lib.chatmark import Checkbox, Form, TextEditor
+from lib.chatmark import Form, GroupedCheckbox, TextEditor, span
+from lib.commit_diff import (
+    SummaryCache,
+    completion,
+    fit_diff,
+    git_pathspec_batch,
+    parse_cache_flag,
+    prompt_too_large,
+    prune_for_prompt,
+)
 from lib.ide_service import IDEService
 
 diff_too_large_message_en = (
@@ -21,7 +33,14 @@ diff_too_large_message_zh = (
     "可以尝试选择部分修改文件多次提交，小修改多提交是更好的做法。"
 )
 
-COMMIT_PROMPT_LIMIT_SIZE = 20000
+# files gathered in one row each in the file picker, as they are rarely picked one by one
+FILE_PICKER_FILTERS = [
+    "package-lock.json",
+    "pnpm-lock.yaml",
+    "go.sum",
+    "*.lock",
+    "*.min.js",
+]
 
 
 def _T(en_text, zh_text):
@@ -104,6 +123,8 @@ prompt_commit_message_by_diff_user_input_llm_config = {
 
 
 language = ""
+# summaries of the changes of files from previous runs, None with --no-cache
+summary_cache = None
 
 
 def assert_value(value, message):
@@ -145,7 +166,8 @@ def get_modified_files():
         tuple: 包含两个list的元组，第一个list包含当前修改过的文件，第二个list包含已经staged的文件
     """
     """ 获取当前修改文件列表以及已经staged的文件列表"""
-    output = subprocess.check_output(["git", "status", "-s", "-u"], text=True, encoding="utf-8")
+    with span("git status", "git"):
+        output = subprocess.check_output(["git", "status", "-s", "-u"], text=True, encoding="utf-8")
     lines = output.split("\n")
     modified_files = []
     staged_files = []
@@ -168,26 +190,37 @@ def get_modified_files():
     return modified_files, staged_files
 
 
-def get_marked_files(modified_files, staged_files):
+def get_marked_files(modified_files, staged_files, on_render=None):
     """
     根据给定的参数获取用户选中以供提交的文件
 
     Args:
         modified_files (List[str]): 用户已修改文件列表
         staged_files (List[str]): 用户已staged文件列表
+        on_render (Callable[[RenderHandle], None]): 表单显示后、等待用户选择前调用，可在后台开始工作
 
     Returns:
         List[str]: 用户选中的文件列表
     """
     # Create two Checkbox instances for staged and unstaged files
     staged_files_show = [f'{file[1] if file[1]!="?" else "U"} {file[0]}' for file in staged_files]
-    staged_checkbox = Checkbox(staged_files_show, [True] * len(staged_files_show))
+    staged_checkbox = GroupedCheckbox(
+        staged_files_show,
+        [True] * len(staged_files_show),
+        paths=[file[0] for file in staged_files],
+        filters=FILE_PICKER_FILTERS,
+    )
 
     unstaged_files = [file for file in modified_files if file[1].strip() != ""]
     unstaged_files_show = [
         f'{file[1] if file[1]!="?" else "U"} {file[0]}' for file in unstaged_files
     ]
-    unstaged_checkbox = Checkbox(unstaged_files_show, [False] * len(unstaged_files_show))
+    unstaged_checkbox = GroupedCheckbox(
+        unstaged_files_show,
+        [False] * len(unstaged_files_show),
+        paths=[file[0] for file in unstaged_files],
+        filters=FILE_PICKER_FILTERS,
+    )
 
     # Create a Form with both Checkbox instances
     form_list = []
@@ -202,7 +235,12 @@ def get_marked_files(modified_files, staged_files):
     form = Form(form_list, submit_button_name="Continue")
 
     # Render the Form and get user input
-    form.render()
+    if on_render is None:
+        form.render()
+    else:
+        handle = form.render_async()
+        on_render(handle)
+        handle.result()
 
     # Retrieve the selected files from both Checkbox instances
     staged_checkbox_selections = staged_checkbox.selections if staged_checkbox.selections else []
@@ -225,19 +263,30 @@ def rebuild_stage_list(staged_select_files, unstaged_select_files):
         None
     """
     # 获取当前所有staged文件
-    current_staged_files = subprocess.check_output(
-        ["git", "diff", "--name-only", "--cached"], text=True
-    ).splitlines()
+    with span("git diff --name-only", "git"):
+        current_staged_files = subprocess.check_output(
+            ["git", "diff", "--name-only", "--cached"], text=True
+        ).splitlines()
 
     # 添加unstaged_select_files中的文件到staged
-    for file in unstaged_select_files:
-        subprocess.check_output(["git", "add", file])
+    if unstaged_select_files:
+        with span("git add", "git"):
+            try:
+                git_pathspec_batch(["add"], unstaged_select_files)
+            except subprocess.CalledProcessError:
+                for file in unstaged_select_files:
+                    subprocess.check_output(["git", "add", file])
 
     # 将不在staged_select_files中的文件从staged移除
-    user_selected_files = staged_select_files + unstaged_select_files
+    user_selected_files = set(staged_select_files + unstaged_select_files)
     files_to_unstage = [file for file in current_staged_files if file not in user_selected_files]
-    for file in files_to_unstage:
-        subprocess.check_output(["git", "reset", file])
+    if files_to_unstage:
+        with span("git reset", "git"):
+            try:
+                git_pathspec_batch(["reset", "-q"], files_to_unstage)
+            except subprocess.CalledProcessError:
+                for file in files_to_unstage:
+                    subprocess.check_output(["git", "reset", file])
 
 
 def get_diff():
@@ -251,15 +300,17 @@ def get_diff():
         bytes: 返回bytes类型，是git diff --cached命令的输出结果
 
     """
-    return subprocess.check_output(["git", "diff", "--cached"])
+    with span("git diff --cached", "git"):
+        return subprocess.check_output(["git", "diff", "--cached"])
 
 
 def get_current_branch():
     try:
         # 使用git命令获取当前分支名称
-        result = subprocess.check_output(
-            ["git", "branch", "--show-current"], stderr=subprocess.STDOUT
-        ).strip()
+        with span("git branch", "git"):
+            result = subprocess.check_output(
+                ["git", "branch", "--show-current"], stderr=subprocess.STDOUT
+            ).strip()
         # 将结果从bytes转换为str
         current_branch = result.decode("utf-8")
         return current_branch
@@ -271,33 +322,128 @@ def get_current_branch():
         return None
 
 
-def generate_commit_message_base_diff(user_input, diff):
+def build_commit_prompt(user_input, diff):
+    """
+    根据diff信息和用户输入构建生成commit消息的prompt
+    """
+    language_prompt = "You must response commit message in chinese。\n" if language == "zh" else ""
+    return PROMPT_COMMIT_MESSAGE_BY_DIFF_USER_INPUT.replace("{__DIFF__}", f"{diff}").replace(
+        "{__USER_INPUT__}", f"{user_input + language_prompt}"
+    )
+
+
+def request_commit_message(prompt):
+    messages = [{"role": "user", "content": prompt}]
+    return chat_completion_stream(messages, prompt_commit_message_by_diff_user_input_llm_config)
+
+
+class CommitMessageDraft:
+    """
+    Commit message generated in the background from the staged diff,
+    while the user is picking the files to commit.
+
+    The draft is reused if the final prompt is the same, i.e. the user kept
+    the staged files selected, otherwise it is discarded.
+    """
+
+    def __init__(self, user_input):
+        self.user_input = user_input
+        self.prompt = None
+        self.duration = None  # seconds taken by the LLM call
+        self._prompt_ready = threading.Event()
+        self._job = None
+
+    def start(self, handle):
+        self._job = handle.submit(self._generate, handle.cancelled)
+
+    def _generate(self, cancelled):
+        try:
+            diff = get_diff()
+            # nothing staged yet, the user picks the files in the form
+            if cancelled.is_set() or not diff.strip():
+                return None
+            pruned = prune_for_prompt(
+                diff,
+                partial(build_commit_prompt, self.user_input),
+                prompt_commit_message_by_diff_user_input_llm_config["model"],
+            )
+            if pruned.overflow or not pruned.text:
+                return None
+            prompt = build_commit_prompt(self.user_input, pruned.text + pruned.report())
+            self.prompt = prompt
+        finally:
+            self._prompt_ready.set()
+
+        start = time.perf_counter()
+        response = request_commit_message(prompt)
+        self.duration = time.perf_counter() - start
+        return response
+
+    def take(self, prompt):
+        """
+        Return the draft response if it was generated from the prompt, None otherwise.
+        """
+        if self._job is None or self._job.cancelled():
+            return None
+
+        self._prompt_ready.wait()
+        if self.prompt is None:
+            # no draft was requested, e.g. nothing was staged
+            return None
+        if self.prompt != prompt:
+            IDEService().ide_logging(
+                "debug", "Speculative commit message discarded, the selected files changed"
+            )
+            return None
+
+        start = time.perf_counter()
+        try:
+            response = self._job.result()
+        except Exception as err:
+            IDEService().ide_logging("debug", f"Speculative commit message failed: {err}")
+            return None
+        waited = time.perf_counter() - start
+        IDEService().ide_logging(
+            "debug",
+            f"Speculative commit message reused, saved {self.duration - waited:.2f} seconds",
+        )
+        return response
+
+
+def generate_commit_message_base_diff(user_input, diff, draft=None):
     """
     根据diff信息，通过AI生成一个commit消息
 
     Args:
         user_input (str): 用户输入的commit信息
-        diff (str): 提交的diff信息
+        diff (bytes): 提交的diff信息，git diff --cached的输出
+        draft (CommitMessageDraft): 后台预先生成的commit消息，prompt相同时复用
 
     Returns:
         str: 生成的commit消息
 
     """
-    global language
-    language_prompt = "You must response commit message in chinese。\n" if language == "zh" else ""
-    prompt = PROMPT_COMMIT_MESSAGE_BY_DIFF_USER_INPUT.replace("{__DIFF__}", f"{diff}").replace(
-        "{__USER_INPUT__}", f"{user_input + language_prompt}"
+    model = prompt_commit_message_by_diff_user_input_llm_config["model"]
+    diff_text = fit_diff(
+        diff,
+        partial(build_commit_prompt, user_input),
+        model,
+        completion(request_commit_message),
+        language,
+        summary_cache,
     )
+    prompt = build_commit_prompt(user_input, diff_text)
 
     model_token_limit_error = (
         diff_too_large_message_en if language == "en" else diff_too_large_message_zh
     )
-    if len(str(prompt)) > COMMIT_PROMPT_LIMIT_SIZE:
+    if prompt_too_large(prompt, model):
         print(model_token_limit_error, flush=True)
         sys.exit(0)
 
-    messages = [{"role": "user", "content": prompt}]
-    response = chat_completion_stream(messages, prompt_commit_message_by_diff_user_input_llm_config)
+    response = draft.take(prompt) if draft is not None else None
+    if response is None:
+        response = request_commit_message(prompt)
 
     if (
         not response["content"]
@@ -329,7 +475,8 @@ def display_commit_message_and_commit(commit_message):
     new_commit_message = text_editor.new_text
     if not new_commit_message:
         return None
-    return subprocess.check_output(["git", "commit", "-m", new_commit_message])
+    with span("git commit", "git"):
+        return subprocess.check_output(["git", "commit", "-m", new_commit_message])
 
 
 def check_git_installed():
@@ -352,7 +499,7 @@ def check_git_installed():
 
 
 def main():
-    global language
+    global language, summary_cache
     try:
         start_msg = _T("Let's follow the steps below.\n\n", "开始按步骤操作。\n\n")
         print(start_msg)
@@ -361,7 +508,11 @@ def main():
             print("Usage: python script.py <user_input>", file=sys.stderr, flush=True)
             sys.exit(-1)
 
-        user_input = sys.argv[1]
+        user_input, use_cache = parse_cache_flag(sys.argv[1])
+        if use_cache:
+            summary_cache = SummaryCache(
+                prompt_commit_message_by_diff_user_input_llm_config["model"]
+            )
         language = IDEService().ide_language()
 
         if not check_git_installed():
@@ -378,7 +529,15 @@ def main():
             print("There are no files to commit.", flush=True)
             sys.exit(0)
 
-        staged_select_files, unstaged_select_files = get_marked_files(modified_files, staged_files)
+        branch_name = get_current_branch()
+        if branch_name:
+            user_input += "\ncurrent repo branch name is:" + branch_name
+
+        # draft a message from the staged files while the user is picking files
+        draft = CommitMessageDraft(user_input)
+        staged_select_files, unstaged_select_files = get_marked_files(
+            modified_files, staged_files, on_render=draft.start
+        )
         if not staged_select_files and not unstaged_select_files:
             no_files_msg = _T(
                 "No files selected, the commit has been aborted.",
@@ -397,10 +556,7 @@ def main():
         )
         print(step2_msg, end="\n\n", flush=True)
         diff = get_diff()
-        branch_name = get_current_branch()
-        if branch_name:
-            user_input += "\ncurrent repo branch name is:" + branch_name
-        commit_message = generate_commit_message_base_diff(user_input, diff)
+        commit_message = generate_commit_message_base_diff(user_input, diff, draft)
         if not commit_message:
             sys.exit(1)
 
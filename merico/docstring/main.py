@@ -5,7 +5,8 @@ import sys
 from devchat.llm import chat
 from devchat.memory import FixSizeChatMemory
 
-from lib.ide_service import IDEService
+from lib.chatmark import coalesced_stdout
+from lib.ide_service import EditorSnapshot, IDEService
 
 PROMPT = prompt = """
 file: {file_path}
@@ -145,7 +146,7 @@ def content_to_json(content):
 ]
 
 
-def get_selected_code():
+def get_selected_code(snapshot: EditorSnapshot):
     """
     Retrieves the selected lines of code from the user's selection.
 
@@ -157,7 +158,7 @@ def get_selected_code():
         dict: A dictionary containing the key 'selectedText' with the selected text
         as its value. If no text is selected, the program exits.
     """
-    selected_data = IDEService().get_selected_range().dict()
+    selected_data = snapshot.selected_range.dict()
 
     miss_selected_error = "Please select some text."
     if selected_data["range"]["start"] == selected_data["range"]["end"]:
@@ -285,12 +286,14 @@ def merge_code(selected_text, docstring):
 
 def main():
     # Prepare code
-    selected_text = get_selected_code()
+    selected_text = get_selected_code(IDEService().editor_snapshot())
 
     # Rewrite
-    response = add_docstring(
-        selected_text=selected_text.get("text", ""), file_path=selected_text.get("abspath", "")
-    )
+    with coalesced_stdout():
+        response = add_docstring(
+            selected_text=selected_text.get("text", ""),
+            file_path=selected_text.get("abspath", ""),
+        )
     if not response:
         sys.exit(1)
 
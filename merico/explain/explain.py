@@ -3,10 +3,11 @@ import sys
 
 from devchat.llm import chat
 
-from lib.ide_service import IDEService
+from lib.chatmark import coalesced_stdout
+from lib.ide_service import EditorSnapshot, IDEService
 
 
-def get_selected_code():
+def get_selected_code(snapshot: EditorSnapshot):
     """
     Retrieves the selected lines of code from the user's selection.
 
@@ -18,7 +19,7 @@ def get_selected_code():
         dict: A dictionary containing the key 'selectedText' with the selected text
         as its value. If no text is selected, the program exits.
     """
-    selected_data = IDEService().get_selected_range().dict()
+    selected_data = snapshot.selected_range.dict()
 
     miss_selected_error = "Please select some text."
     if selected_data["range"]["start"] == selected_data["range"]["end"]:
@@ -35,14 +36,14 @@ def get_selected_code():
     return selected_data
 
 
-def get_visible_code():
+def get_visible_code(snapshot: EditorSnapshot):
     """
     Retrieves visible code from the visible_lines function.
 
     Returns:
     visible_data: The visible code retrieved from the visible_lines function.
     """
-    visible_data = IDEService().get_visible_range().dict()
+    visible_data = snapshot.visible_range.dict()
     return visible_data
 
 
@@ -83,7 +84,11 @@ def explain(selected_text, visible_text):
 
 
 def main():
-    result = explain(selected_text=get_selected_code(), visible_text=get_visible_code())
+    snapshot = IDEService().editor_snapshot()
+    with coalesced_stdout():
+        result = explain(
+            selected_text=get_selected_code(snapshot), visible_text=get_visible_code(snapshot)
+        )
     sys.exit(0 if result else 1)
 
 
@@ -4,7 +4,8 @@ import sys
 
 from devchat.llm import chat
 
-from lib.ide_service import IDEService
+from lib.chatmark import coalesced_stdout
+from lib.ide_service import EditorSnapshot, IDEService
 
 
 def extract_markdown_block(text):
@@ -28,8 +29,8 @@ def extract_markdown_block(text):
 
 
 # step 1 : get selected code
-def get_selected_code():
-    selected_data = IDEService().get_selected_range().dict()
+def get_selected_code(snapshot: EditorSnapshot):
+    selected_data = snapshot.selected_range.dict()
 
     if selected_data["range"]["start"] == -1:
         return None, None, None
@@ -129,7 +130,7 @@ def try_parse_user_input():
 
 def main():
     print("start fix issue ...\n\n")
-    file_path, issue_line, issue_line_num = get_selected_code()
+    file_path, issue_line, issue_line_num = get_selected_code(IDEService().editor_snapshot())
     if not file_path or not issue_line:
         print("No code selected. Please select the code line you want to fix.", file=sys.stderr)
         sys.exit(1)
@@ -147,12 +148,13 @@ def main():
     print("--->>:", rule_description)
 
     print("call llm to fix issue ...\n\n")
-    fix_solutions = call_llm_to_generate_fix_solutions(
-        file_content=current_file_content,
-        issue_line_code=issue_line,
-        issue_description=issue_description,
-        rule_description=rule_description,
-    )
+    with coalesced_stdout():
+        fix_solutions = call_llm_to_generate_fix_solutions(
+            file_content=current_file_content,
+            issue_line_code=issue_line,
+            issue_description=issue_description,
+            rule_description=rule_description,
+        )
     if not fix_solutions:
         sys.exit(1)
 
@@ -6,7 +6,15 @@ import sys
 
 from devchat.llm import chat_completion_stream
 
-from lib.chatmark import Checkbox, Form, TextEditor
+from lib.chatmark import Form, GroupedCheckbox, TextEditor, span
+from lib.commit_diff import (
+    SummaryCache,
+    completion,
+    fit_diff,
+    git_pathspec_batch,
+    parse_cache_flag,
+    prompt_too_large,
+)
 from lib.ide_service import IDEService
 
 sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
@@ -25,7 +33,14 @@ diff_too_large_message_zh = (
     "可以尝试选择部分修改文件多次提交，小修改多提交是更好的做法。"
 )
 
-COMMIT_PROMPT_LIMIT_SIZE = 20000
+# files gathered in one row each in the file picker, as they are rarely picked one by one
+FILE_PICKER_FILTERS = [
+    "package-lock.json",
+    "pnpm-lock.yaml",
+    "go.sum",
+    "*.lock",
+    "*.min.js",
+]
 
 
 def extract_markdown_block(text):
@@ -96,6 +111,8 @@ prompt_commit_message_by_diff_user_input_llm_config = {
 
 
 language = ""
+# summaries of the changes of files from previous runs, None with --no-cache
+summary_cache = None
 
 
 def assert_value(value, message):
@@ -137,7 +154,8 @@ def get_modified_files():
         tuple: 包含两个list的元组，第一个list包含当前修改过的文件，第二个list包含已经staged的文件
     """
     """ 获取当前修改文件列表以及已经staged的文件列表"""
-    output = subprocess.check_output(["git", "status", "-s", "-u"], text=True, encoding="utf-8")
+    with span("git status", "git"):
+        output = subprocess.check_output(["git", "status", "-s", "-u"], text=True, encoding="utf-8")
     lines = output.split("\n")
     modified_files = []
     staged_files = []
@@ -172,10 +190,15 @@ def get_marked_files(modified_files, staged_files):
         List[str]: 用户选中的文件列表
     """
     # Create two Checkbox instances for staged and unstaged files
-    staged_checkbox = Checkbox(staged_files, [True] * len(staged_files))
+    staged_checkbox = GroupedCheckbox(
+        staged_files, [True] * len(staged_files), filters=FILE_PICKER_FILTERS
+    )
 
-    unstaged_files = [file for file in modified_files if file not in staged_files]
-    unstaged_checkbox = Checkbox(unstaged_files, [False] * len(unstaged_files))
+    staged_set = set(staged_files)
+    unstaged_files = [file for file in modified_files if file not in staged_set]
+    unstaged_checkbox = GroupedCheckbox(
+        unstaged_files, [False] * len(unstaged_files), filters=FILE_PICKER_FILTERS
+    )
 
     # Create a Form with both Checkbox instances
     form_list = []
@@ -216,10 +239,17 @@ def rebuild_stage_list(user_files):
 
     """
     # Unstage all files
-    subprocess.check_output(["git", "reset"])
+    with span("git reset", "git"):
+        subprocess.check_output(["git", "reset"])
     # Stage all user_files
-    for file in user_files:
-        os.system(f'git add "{file}"')
+    if not user_files:
+        return
+    with span("git add", "git"):
+        try:
+            git_pathspec_batch(["add"], user_files)
+        except subprocess.CalledProcessError:
+            for file in user_files:
+                os.system(f'git add "{file}"')
 
 
 def get_diff():
@@ -233,15 +263,17 @@ def get_diff():
         bytes: 返回bytes类型，是git diff --cached命令的输出结果
 
     """
-    return subprocess.check_output(["git", "diff", "--cached"])
+    with span("git diff --cached", "git"):
+        return subprocess.check_output(["git", "diff", "--cached"])
 
 
 def get_current_branch():
     try:
         # 使用git命令获取当前分支名称
-        result = subprocess.check_output(
-            ["git", "branch", "--show-current"], stderr=subprocess.STDOUT
-        ).strip()
+        with span("git branch", "git"):
+            result = subprocess.check_output(
+                ["git", "branch", "--show-current"], stderr=subprocess.STDOUT
+            ).strip()
         # 将结果从bytes转换为str
         current_branch = result.decode("utf-8")
         return current_branch
@@ -253,13 +285,18 @@ def get_current_branch():
         return None
 
 
+def request_commit_message(prompt):
+    messages = [{"role": "user", "content": prompt}]
+    return chat_completion_stream(messages, prompt_commit_message_by_diff_user_input_llm_config)
+
+
 def generate_commit_message_base_diff(user_input, diff, issue):
     """
     根据diff信息，通过AI生成一个commit消息
 
     Args:
         user_input (str): 用户输入的commit信息
-        diff (str): 提交的diff信息
+        diff (bytes): 提交的diff信息，git diff --cached的输出
 
     Returns:
         str: 生成的commit消息
@@ -267,21 +304,28 @@ def generate_commit_message_base_diff(user_input, diff, issue):
     """
     global language
     language_prompt = "You must response commit message in chinese。\n" if language == "zh" else ""
-    prompt = (
-        PROMPT_COMMIT_MESSAGE_BY_DIFF_USER_INPUT.replace("{__DIFF__}", f"{diff}")
-        .replace("{__USER_INPUT__}", f"{user_input + language_prompt}")
-        .replace("{__ISSUE__}", f"{issue}")
+
+    def build_prompt(diff_text):
+        return (
+            PROMPT_COMMIT_MESSAGE_BY_DIFF_USER_INPUT.replace("{__DIFF__}", f"{diff_text}")
+            .replace("{__USER_INPUT__}", f"{user_input + language_prompt}")
+            .replace("{__ISSUE__}", f"{issue}")
+        )
+
+    model = prompt_commit_message_by_diff_user_input_llm_config["model"]
+    diff_text = fit_diff(
+        diff, build_prompt, model, completion(request_commit_message), language, summary_cache
     )
+    prompt = build_prompt(diff_text)
 
     model_token_limit_error = (
         diff_too_large_message_en if language == "en" else diff_too_large_message_zh
     )
-    if len(str(prompt)) > COMMIT_PROMPT_LIMIT_SIZE:
+    if prompt_too_large(prompt, model):
         print(model_token_limit_error, flush=True)
         sys.exit(0)
 
-    messages = [{"role": "user", "content": prompt}]
-    response = chat_completion_stream(messages, prompt_commit_message_by_diff_user_input_llm_config)
+    response = request_commit_message(prompt)
 
     if (
         not response["content"]
@@ -313,7 +357,8 @@ def display_commit_message_and_commit(commit_message):
     new_commit_message = text_editor.new_text
     if not new_commit_message:
         return None
-    return subprocess.check_output(["git", "commit", "-m", new_commit_message])
+    with span("git commit", "git"):
+        return subprocess.check_output(["git", "commit", "-m", new_commit_message])
 
 
 def extract_issue_id(branch_name):
@@ -356,7 +401,7 @@ def check_git_installed():
 
 
 def main():
-    global language
+    global language, summary_cache
     try:
         print("Let's follow the steps below.\n\n")
         # Ensure enough command line arguments are provided
@@ -364,7 +409,11 @@ def main():
             print("Usage: python script.py <user_input> <language>", file=sys.stderr, flush=True)
             sys.exit(-1)
 
-        user_input = sys.argv[1]
+        user_input, use_cache = parse_cache_flag(sys.argv[1])
+        if use_cache:
+            summary_cache = SummaryCache(
+                prompt_commit_message_by_diff_user_input_llm_config["model"]
+            )
         language = sys.argv[2]
 
         if not check_git_installed():
@@ -5,7 +5,8 @@ import sys
 from devchat.llm import chat
 from devchat.memory import FixSizeChatMemory
 
-from lib.ide_service import IDEService
+from lib.chatmark import coalesced_stdout
+from lib.ide_service import EditorSnapshot, IDEService
 
 PROMPT = prompt = """
 file: {file_path}
@@ -141,7 +142,7 @@ print is a function call, if you rename it, this will make a compile error.
 ]
 
 
-def get_selected_code():
+def get_selected_code(snapshot: EditorSnapshot):
     """
     Retrieves the selected lines of code from the user's selection.
 
@@ -153,7 +154,7 @@ def get_selected_code():
         dict: A dictionary containing the key 'selectedText' with the selected text
         as its value. If no text is selected, the program exits.
     """
-    selected_data = IDEService().get_selected_range().dict()
+    selected_data = snapshot.selected_range.dict()
 
     miss_selected_error = "Please select some text."
     if selected_data["range"]["start"] == selected_data["range"]["end"]:
@@ -223,12 +224,13 @@ def remove_unnecessary_escapes(code_a, code_b):
 
 def main():
     # prepare code
-    selected_text = get_selected_code()
+    selected_text = get_selected_code(IDEService().editor_snapshot())
     selected_code = selected_text.get("text", "")
     selected_file = selected_text.get("abspath", "")
 
     # rewrite
-    response = reanme_variable(selected_text=selected_code, file_path=selected_file)
+    with coalesced_stdout():
+        response = reanme_variable(selected_text=selected_code, file_path=selected_file)
     if not response:
         sys.exit(1)
 
@@ -4,10 +4,11 @@ import sys
 
 from devchat.llm import chat
 
-from lib.ide_service import IDEService
+from lib.chatmark import coalesced_stdout
+from lib.ide_service import EditorSnapshot, IDEService
 
 
-def get_selected_code():
+def get_selected_code(snapshot: EditorSnapshot):
     """
     Retrieves the selected lines of code from the user's selection.
 
@@ -19,7 +20,7 @@ def get_selected_code():
         dict: A dictionary containing the key 'selectedText' with the selected text
         as its value. If no text is selected, the program exits.
     """
-    selected_data = IDEService().get_selected_range().dict()
+    selected_data = snapshot.selected_range.dict()
 
     miss_selected_error = "Please select some text."
     if selected_data["range"]["start"] == selected_data["range"]["end"]:
@@ -116,10 +117,11 @@ def replace_selected(new_code):
 def main():
     question = sys.argv[1]
     # prepare code
-    selected_text = get_selected_code()
+    selected_text = get_selected_code(IDEService().editor_snapshot())
 
     # rewrite
-    response = ai_rewrite(question=question, selected_text=selected_text)
+    with coalesced_stdout():
+        response = ai_rewrite(question=question, selected_text=selected_text)
     if not response:
         sys.exit(1)
 
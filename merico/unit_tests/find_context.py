@@ -1,7 +1,10 @@
+import asyncio
 import os
 from collections import defaultdict
+from contextlib import closing
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Set
+from functools import partial
+from typing import Dict, List, Optional, Set, Tuple
 
 from assistants.recommend_test_context import get_recommended_symbols
 from model import FuncToTest
@@ -13,6 +16,7 @@ from tools.symbol_util import (
 )
 
 from lib.ide_service import (
+    AsyncIDEService,
     IDEService,
     Location,
     Position,
@@ -63,32 +67,81 @@ def _extract_referenced_symbols_context(
 
     # Get the content of the symbols
     for s in referenced_symbols:
-        content = get_symbol_content(s, file_content=func_to_test.file_content)
+        content = get_symbol_content(s, abspath=func_to_test.abspath)
         context = Context(file_path=func_to_test.file_path, content=content, range=s.range)
         referenced_symbols_context[s.name].append(context)
     return referenced_symbols_context
 
 
-def _find_children_symbols_type_def_context(
-    func_to_test: FuncToTest, func_symbol: SymbolNode
+def _find_symbols_at_lines(
+    client: IDEService, abspath: str, lines: Set[int]
+) -> Dict[int, List[Tuple[SymbolNode, int]]]:
+    """
+    Find the first symbol starting at each of the lines of a file.
+
+    The document symbols are streamed, the rest of them isn't read once every
+    line has its symbol.
+    """
+    found: Dict[int, List[Tuple[SymbolNode, int]]] = {}
+    with closing(client.iter_document_symbols(abspath)) as symbols:
+        for top in symbols:
+            for line in lines.difference(found):
+                targets = find_symbol_nodes([top], line=line, limit=1)
+                if targets:
+                    found[line] = targets
+            if len(found) == len(lines):
+                break
+    return found
+
+
+async def _find_symbols_of_locations(
+    client: AsyncIDEService, locations: Dict[str, Set[Location]]
+) -> Dict[str, Dict[int, List[Tuple[SymbolNode, int]]]]:
+    """
+    Find the symbols starting at the locations, in every file concurrently.
+
+    return: abspath -> start line -> a list of tuples (symbol, depth)
+    """
+    lines: Dict[str, Set[int]] = defaultdict(set)
+    for locs in locations.values():
+        for loc in locs:
+            lines[loc.abspath].add(loc.range.start.line)
+
+    abspaths = list(lines)
+    found = await asyncio.gather(
+        *(client.run(partial(_find_symbols_at_lines, abspath=p, lines=lines[p])) for p in abspaths)
+    )
+    return dict(zip(abspaths, found))
+
+
+async def _find_children_symbols_type_def_context(
+    client: AsyncIDEService, func_to_test: FuncToTest, func_symbol: SymbolNode
 ) -> Dict[str, List[Context]]:
     """
     Find the type definitions of the symbols in the function.
     """
     type_defs: Dict[str, List[Context]] = defaultdict(list)
 
-    client = IDEService()
     abs_path = os.path.join(func_to_test.repo_root, func_to_test.file_path)
 
     type_def_locations: Dict[str, Set[Location]] = defaultdict(set)
-    # find type definitions for symbols in the function
+    # collect the symbols in the function
+    children: List[SymbolNode] = []
     stack = func_symbol.children[:]
     while stack:
         s = stack.pop()
+        children.append(s)
+        stack.extend(s.children)
 
-        locations = client.find_type_def_locations(
-            abs_path, s.range.start.line, s.range.start.character
+    # find type definitions for symbols in the function
+    children_locations = await asyncio.gather(
+        *(
+            client.find_type_def_locations(abs_path, s.range.start.line, s.range.start.character)
+            for s in children
         )
+    )
+
+    for s, locations in zip(children, children_locations):
         for loc in locations:
             # check if loc.abspath is in func_to_test.repo_root
             if not loc.abspath.startswith(func_to_test.repo_root):
@@ -100,13 +153,11 @@ def _find_children_symbols_type_def_context(
 
             type_def_locations[s.name].add(loc)
 
-        stack.extend(s.children)
-
     # Get the content of the type definitions
+    symbols_at = await _find_symbols_of_locations(client, type_def_locations)
     for symbol_name, locations in type_def_locations.items():
         for loc in locations:
-            symbols = client.get_document_symbols(loc.abspath)
-            targets = find_symbol_nodes(symbols, line=loc.range.start.line)
+            targets = symbols_at[loc.abspath].get(loc.range.start.line, [])
             for t, _ in targets:
                 content = get_symbol_content(t, abspath=loc.abspath)
                 relpath = os.path.relpath(loc.abspath, func_to_test.repo_root)
@@ -116,14 +167,13 @@ def _find_children_symbols_type_def_context(
     return type_defs
 
 
-def _extract_recommended_symbols_context(
-    func_to_test: FuncToTest, symbol_names: List[str]
+async def _extract_recommended_symbols_context(
+    client: AsyncIDEService, func_to_test: FuncToTest, symbol_names: List[str]
 ) -> Dict[str, List[Context]]:
     """
     Extract context of the given symbol names.
     """
     abs_path = os.path.join(func_to_test.repo_root, func_to_test.file_path)
-    client = IDEService()
 
     # symbol name -> a list of context
     recommended_symbols: Dict[str, List[Context]] = defaultdict(list)
@@ -131,9 +181,8 @@ def _extract_recommended_symbols_context(
     # Will try to find both Definition and Type Definition for a symbol
     symbol_def_locations: Dict[str, Set[Location]] = {}
 
+    symbol_positions: Dict[str, List[Position]] = {}
     for symbol_name in symbol_names:
-        def_locs = set()
-
         symbol_tokens = split_tokens(symbol_name)
         # Use the last token to locate the symbol as an approximation
         last_token = None
@@ -145,12 +194,26 @@ def _extract_recommended_symbols_context(
                     last_token = s
 
         # locate the symbol in the file
-        positions: List[Position] = locate_symbol_by_name(last_token, abs_path)
+        symbol_positions[symbol_name] = locate_symbol_by_name(last_token, abs_path)
+
+    async def _find_locations(pos: Position) -> List[Location]:
+        type_locations, def_locations = await asyncio.gather(
+            client.find_type_def_locations(abs_path, pos.line, pos.character),
+            client.find_def_locations(abs_path, pos.line, pos.character),
+        )
+        return type_locations + def_locations
+
+    names = list(symbol_positions)
+    names_locations = await asyncio.gather(
+        *(
+            asyncio.gather(*(_find_locations(pos) for pos in symbol_positions[name]))
+            for name in names
+        )
+    )
 
-        for pos in positions:
-            type_locations = client.find_type_def_locations(abs_path, pos.line, pos.character)
-            def_locations = client.find_def_locations(abs_path, pos.line, pos.character)
-            locations = type_locations + def_locations
+    for symbol_name, pos_locations in zip(names, names_locations):
+        def_locs = set()
+        for locations in pos_locations:
             for loc in locations:
                 # check if loc.abspath is in func_to_test.repo_root
                 if not loc.abspath.startswith(func_to_test.repo_root):
@@ -161,13 +224,12 @@ def _extract_recommended_symbols_context(
         symbol_def_locations[symbol_name] = def_locs
 
     # Get the content of the found definitions
+    symbols_at = await _find_symbols_of_locations(client, symbol_def_locations)
     for symbol_name, locations in symbol_def_locations.items():
         for loc in locations:
             # NOTE: further improvement is needed to
             # get the symbol node of function with decorator in Python
-            symbols = client.get_document_symbols(loc.abspath)
-            # targets = find_symbol_nodes(symbols, name=symbol_name, line=loc.range.start.line)
-            targets = find_symbol_nodes(symbols, line=loc.range.start.line)
+            targets = symbols_at[loc.abspath].get(loc.range.start.line, [])
 
             for t, _ in targets:
                 content = get_symbol_content(t, abspath=loc.abspath)
@@ -184,17 +246,23 @@ def find_symbol_context_by_static_analysis(
     """
     Find the context of symbols in the function to test by static analysis.
     """
+    return asyncio.run(_find_symbol_context_by_static_analysis(func_to_test, chat_language))
+
+
+async def _find_symbol_context_by_static_analysis(
+    func_to_test: FuncToTest, chat_language: str
+) -> Dict[str, List[Context]]:
     abs_path = os.path.join(func_to_test.repo_root, func_to_test.file_path)
-    client = IDEService()
+    client = AsyncIDEService()
 
     # symbol name -> a list of context
     symbol_context: Dict[str, List[Context]] = defaultdict(list)
 
     # Get all symbols in the file
-    doc_symbols = client.get_document_symbols(abs_path)
+    symbol_table = await client.get_document_symbol_table(abs_path)
     # Find the symbol of the function to test
     func_symbols = find_symbol_nodes(
-        doc_symbols, name=func_to_test.func_name, line=func_to_test.func_start_line
+        symbol_table, name=func_to_test.func_name, line=func_to_test.func_start_line
     )
     if not func_symbols:
         return symbol_context
@@ -202,9 +270,11 @@ def find_symbol_context_by_static_analysis(
     func_symbol, func_depth = func_symbols[0]
 
     context_by_reference = _extract_referenced_symbols_context(
-        func_to_test, doc_symbols, depth=func_depth
+        func_to_test, symbol_table.nodes(), depth=func_depth
+    )
+    context_by_type_def = await _find_children_symbols_type_def_context(
+        client, func_to_test, func_symbol
     )
-    context_by_type_def = _find_children_symbols_type_def_context(func_to_test, func_symbol)
 
     symbol_context.update(context_by_reference)
     symbol_context.update(context_by_type_def)
@@ -220,6 +290,8 @@ def find_symbol_context_of_llm_recommendation(
     """
     recommended_symbols = get_recommended_symbols(func_to_test, known_context)
 
-    recommended_context = _extract_recommended_symbols_context(func_to_test, recommended_symbols)
+    recommended_context = asyncio.run(
+        _extract_recommended_symbols_context(AsyncIDEService(), func_to_test, recommended_symbols)
+    )
 
     return recommended_context
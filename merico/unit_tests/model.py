@@ -1,7 +1,8 @@
+import os
 from dataclasses import dataclass
 from typing import Optional
 
-from tools.file_util import retrieve_file_content
+from lib.ide_service import FileView, get_file_view
 
 
 class TokenBudgetExceededException(Exception):
@@ -39,17 +40,24 @@ class FuncToTest:
     def __repr__(self) -> str:
         return f"{self.file_path}:L{self.func_start_line}:{self.func_name}"
 
+    @property
+    def abspath(self) -> str:
+        return os.path.join(self.repo_root, self.file_path)
+
+    @property
+    def file_view(self) -> FileView:
+        return get_file_view(self.abspath)
+
     @property
     def file_content(self) -> str:
         if self._file_content is None:
-            self._file_content = retrieve_file_content(self.file_path, self.repo_root)
+            self._file_content = self.file_view.content()
         return self._file_content
 
     @property
     def func_content(self) -> str:
         if self._func_content is None:
-            lines = self.file_content.split("\n")
-            self._func_content = "\n".join(lines[self.func_start_line : self.func_end_line + 1])
+            self._func_content = self.file_view.text(self.func_start_line, 0, self.func_end_line)
         return self._func_content
 
     @property
@@ -58,8 +66,7 @@ class FuncToTest:
             return None
 
         if self._container_content is None:
-            lines = self.file_content.split("\n")
-            self._container_content = "\n".join(
-                lines[self.container_start_line : self.container_end_line + 1]
+            self._container_content = self.file_view.text(
+                self.container_start_line, 0, self.container_end_line
             )
         return self._container_content
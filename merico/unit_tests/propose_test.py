@@ -17,6 +17,8 @@ from prompts import PROPOSE_TEST_PROMPT
 from tools.tiktoken_util import get_encoding
 from tools.time_util import print_exec_time
 
+from lib.chatmark import span
+
 MODEL = USER_LLM_MODEL if USE_USER_MODEL else "gpt-4-turbo-preview"  # "gpt-3.5-turbo"
 ENCODING = (
     get_encoding(DEFAULT_ENCODING)  # Use default encoding as an approximation
@@ -72,7 +74,8 @@ def _mk_user_msg(
     prioritized_msgs = [msg_0, msg_1, msg_2]
 
     for msg in prioritized_msgs:
-        token_count = len(ENCODING.encode(msg, disallowed_special=()))
+        with span("tokenize", "tokenize"):
+            token_count = len(ENCODING.encode(msg, disallowed_special=()))
         if token_count <= TOKEN_BUDGET:
             return msg
 
@@ -112,27 +115,29 @@ def propose_test(
     json_res = {}
     if USE_USER_MODEL:
         # Use the wrapped api parameters
-        json_res = (
-            chat_completion_no_stream_return_json(
-                messages=[{"role": "user", "content": user_msg}],
-                llm_config={
-                    "model": MODEL,
-                    "temperature": 0.1,
-                },
+        with span(f"LLM {MODEL}", "llm"):
+            json_res = (
+                chat_completion_no_stream_return_json(
+                    messages=[{"role": "user", "content": user_msg}],
+                    llm_config={
+                        "model": MODEL,
+                        "temperature": 0.1,
+                    },
+                )
+                or {}
             )
-            or {}
-        )
         if not json_res:
             raise ValueError("No valid json response")
 
     else:
         # Use the openai api parameters
-        content = create_chat_completion_content(
-            model=MODEL,
-            messages=[{"role": "user", "content": user_msg}],
-            response_format={"type": "json_object"},
-            temperature=0.1,
-        )
+        with span(f"LLM {MODEL}", "llm"):
+            content = create_chat_completion_content(
+                model=MODEL,
+                messages=[{"role": "user", "content": user_msg}],
+                response_format={"type": "json_object"},
+                temperature=0.1,
+            )
         json_res = json.loads(content)
 
     cases = json_res.get("test_cases", [])
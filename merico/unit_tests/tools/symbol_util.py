@@ -1,10 +1,8 @@
 import re
 from collections import defaultdict
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
 
-from tools.file_util import retrieve_file_content
-
-from lib.ide_service import Position, SymbolNode
+from lib.ide_service import Position, SymbolNode, SymbolTable, get_file_view
 
 
 def split_tokens(text: str) -> Dict[str, List[int]]:
@@ -54,33 +52,63 @@ def locate_symbol_by_name(
 
 
 def find_symbol_nodes(
-    symbols: List[SymbolNode], name: Optional[str] = None, line: Optional[int] = None
+    symbols: Union[Iterable[SymbolNode], SymbolTable],
+    name: Optional[str] = None,
+    line: Optional[int] = None,
+    limit: Optional[int] = None,
 ) -> List[Tuple[SymbolNode, int]]:
     """
     Find the symbols with the specified name and line number.
+    A SymbolTable is searched through its indexes instead of walking the tree.
+
+    symbols: the top-level symbols, may be streamed by IDEService.iter_document_symbols
+    limit: stop after finding this number of symbols, the rest of symbols isn't consumed
+
+    Symbols are reported from the last top-level symbol to the first, each
+    subtree in pre-order. Streamed symbols are walked in the order they arrive.
 
     return: a list of tuples (symbol, depth)
     """
     assert name is not None or line is not None
 
+    if isinstance(symbols, SymbolTable):
+        found = symbols.find(name, line)
+        # stable, matches under the same top-level symbol stay in pre-order
+        found.sort(key=lambda item: -_top_level(symbols, item[0]))
+        return [(symbols.node(i), depth) for i, depth in found[:limit]]
+
     res = []
-    stack = [(s, 0) for s in symbols]
-    while stack:
-        symbol, depth = stack.pop()
-        flag = True
-        if name and symbol.name != name:
-            flag = False
-        if line and symbol.range.start.line != line:
-            flag = False
-
-        if flag:
-            res.append((symbol, depth))
-        else:
-            stack.extend((c, depth + 1) for c in reversed(symbol.children))
+    tops = reversed(symbols) if isinstance(symbols, Sequence) else symbols
+    for top in tops:
+        stack = [(top, 0)]
+        while stack:
+            symbol, depth = stack.pop()
+            flag = True
+            if name and symbol.name != name:
+                flag = False
+            if line and symbol.range.start.line != line:
+                flag = False
+
+            if flag:
+                res.append((symbol, depth))
+                if limit is not None and len(res) >= limit:
+                    return res
+            elif not line or symbol.range.start.line <= line <= symbol.range.end.line:
+                # symbols starting at the line are within the ranges of their ancestors
+                stack.extend((c, depth + 1) for c in reversed(symbol.children))
 
     return res
 
 
+def _top_level(table: SymbolTable, index: int) -> int:
+    """
+    Index of the top-level symbol containing the symbol.
+    """
+    while table.parent[index] >= 0:
+        index = table.parent[index]
+    return index
+
+
 def get_symbol_content(
     symbol: SymbolNode,
     file_content: Optional[str] = None,
@@ -92,12 +120,13 @@ def get_symbol_content(
     if file_content is None and abspath is None:
         raise ValueError("Either file_content or abspath should be provided")
 
+    start, end = symbol.range.start, symbol.range.end
     if file_content is None:
-        file_content = retrieve_file_content(abspath, None)
+        return get_file_view(abspath).text(start.line, 0, end.line, end.character)
 
     lines = file_content.split("\n")
 
-    content = lines[symbol.range.start.line : symbol.range.end.line]
-    content.append(lines[symbol.range.end.line][: symbol.range.end.character])
+    content = lines[start.line : end.line]
+    content.append(lines[end.line][: end.character])
 
     return "\n".join(content)
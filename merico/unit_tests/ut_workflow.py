@@ -18,7 +18,7 @@ from propose_test import propose_test
 from tools.file_util import retrieve_file_content
 from write_tests import write_and_print_tests
 
-from lib.chatmark import Checkbox, Form, Step, TextEditor
+from lib.chatmark import Checkbox, Form, Step, TextEditor, span
 
 
 class UnitTestsWorkflow:
@@ -45,7 +45,8 @@ class UnitTestsWorkflow:
 
         with Step(msg):
             print("\n- Analyzing context for the function...", flush=True)
-            symbol_context = self.step_1_find_symbol_context()
+            with span("find symbol context"):
+                symbol_context = self.step_1_find_symbol_context()
 
             contexts = set()
             for _, v in symbol_context.items():
@@ -53,10 +54,12 @@ class UnitTestsWorkflow:
             contexts = list(contexts)
 
             print("- Finding reference files...", flush=True)
-            reference_files = self.step_2_find_reference_files()
+            with span("find reference files"):
+                reference_files = self.step_2_find_reference_files()
 
             print("- Proposing test cases...", flush=True)
-            cases = self.step_3_propose_cases(contexts)
+            with span("propose test cases"):
+                cases = self.step_3_propose_cases(contexts)
 
         res = self.step_4_user_interaction(cases, reference_files)
         cases = res[0]
@@ -68,9 +71,10 @@ class UnitTestsWorkflow:
         self.step_6_write_and_print_tests(cases, files, contexts, requirements)
 
     def step_1_find_symbol_context(self) -> Dict[str, List[Context]]:
-        symbol_context = find_symbol_context_by_static_analysis(
-            self.func_to_test, self.tui_lang.chat_language
-        )
+        with span("static analysis"):
+            symbol_context = find_symbol_context_by_static_analysis(
+                self.func_to_test, self.tui_lang.chat_language
+            )
 
         known_context_for_llm: List[Context] = []
         if self.func_to_test.container_content is not None:
@@ -88,9 +92,10 @@ class UnitTestsWorkflow:
             {item for sublist in list(symbol_context.values()) for item in sublist}
         )
 
-        recommended_context = find_symbol_context_of_llm_recommendation(
-            self.func_to_test, known_context_for_llm
-        )
+        with span("LLM recommended context"):
+            recommended_context = find_symbol_context_of_llm_recommendation(
+                self.func_to_test, known_context_for_llm
+            )
 
         symbol_context.update(recommended_context)
 
@@ -16,6 +16,8 @@ from prompts import WRITE_TESTS_PROMPT
 from tools.file_util import retrieve_file_content
 from tools.tiktoken_util import get_encoding
 
+from lib.chatmark import coalesced_stdout
+
 MODEL = USER_LLM_MODEL if USE_USER_MODEL else "gpt-4-turbo-preview"
 ENCODING = (
     get_encoding(DEFAULT_ENCODING)  # Use default encoding as an approximation
@@ -138,10 +140,11 @@ def write_and_print_tests(
 
     if USE_USER_MODEL:
         # Use the wrapped api
-        response = chat_completion_stream_out(
-            messages=[{"role": "user", "content": user_msg}],
-            llm_config={"model": MODEL, "temperature": 0.1},
-        )
+        with coalesced_stdout():
+            response = chat_completion_stream_out(
+                messages=[{"role": "user", "content": user_msg}],
+                llm_config={"model": MODEL, "temperature": 0.1},
+            )
         if not response.get("content", None):
             raise response["error"]
 
@@ -152,10 +155,11 @@ def write_and_print_tests(
             messages=[{"role": "user", "content": user_msg}],
             temperature=0.1,
         )
-        for chunk in chunks:
-            if chunk.choices[0].finish_reason == "stop":
-                break
-
-            content = chunk.choices[0].delta.content
-            if content is not None:
-                print(content, flush=True, end="")
+        with coalesced_stdout() as out:
+            for chunk in chunks:
+                if chunk.choices[0].finish_reason == "stop":
+                    break
+
+                content = chunk.choices[0].delta.content
+                if content is not None:
+                    out.write(content)